@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.asgi import PublicAPI
+
+# Public read endpoints on an async engine; everything else falls back to
+# the Flask app. See DOCKER.md, "Async public API".
+app = PublicAPI(create_app())
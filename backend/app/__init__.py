@@ -3,16 +3,42 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.assets import AssetManifest
+from app.auth import LoginGuard, UserCache
+from app.cache import ContentVersion, ResponseCache
+from app.compression import ResponseCompressor
+from app.delivery import FileDelivery
+from app.images import ImageWorker
+from app.json_provider import OrjsonProvider, orjson
+from app.mail import EmailOutbox
+from app.metrics import Metrics
+from app.query_profiler import QueryProfiler
+from app.pool import engine_options, checkout_stats
+from app.storage import BlobStorage
 import os
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
+content_version = ContentVersion()
+response_cache = ResponseCache()
+response_compressor = ResponseCompressor()
+image_worker = ImageWorker()
+blob_storage = BlobStorage()
+asset_manifest = AssetManifest()
+file_delivery = FileDelivery()
+email_outbox = EmailOutbox()
+login_guard = LoginGuard()
+user_cache = UserCache()
+metrics = Metrics()
+query_profiler = QueryProfiler()
 
 def create_app():
-    app = Flask(__name__, 
-                static_folder='../../out',
-                static_url_path='')
+    # The Next.js export in out/ is served by the frontend blueprint.
+    app = Flask(__name__, static_folder=None)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     
     secret_key = os.environ.get('SECRET_KEY')
     if not secret_key:
@@ -23,15 +49,78 @@ def create_app():
     app.config['SECRET_KEY'] = secret_key
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['UPLOAD_FOLDER'] = 'backend/app/static/uploads'
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['ASYNC_DATABASE_URI'] = os.environ.get('ASYNC_DATABASE_URL')
+    checkout_stats.slow_threshold = float(os.environ.get('DB_POOL_SLOW_CHECKOUT', 0.1))
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    # Folder batch uploads carry many files, so they get their own request limit.
+    app.config['UPLOAD_BATCH_MAX_SIZE'] = int(os.environ.get('UPLOAD_BATCH_MAX_SIZE', 200 * 1024 * 1024))
+    app.config['UPLOAD_MAX_FILE_SIZE'] = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 10 * 1024 * 1024))
     app.config['WTF_CSRF_ENABLED'] = True
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+    app.config['API_CACHE_MAX_ENTRIES'] = int(os.environ.get('API_CACHE_MAX_ENTRIES', 512))
+    app.config['API_CACHE_TTL'] = int(os.environ.get('API_CACHE_TTL', 300))
+    app.config['VERSION_CHECK_INTERVAL'] = float(os.environ.get('VERSION_CHECK_INTERVAL', 1.0))
+    app.config['API_PAGE_SIZE'] = int(os.environ.get('API_PAGE_SIZE', 60))
+    app.config['API_MAX_PAGE_SIZE'] = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+    app.config['API_CACHE_CONTROL'] = os.environ.get('API_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=600')
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['FILE_DELIVERY'] = os.environ.get('FILE_DELIVERY')
+    app.config['X_ACCEL_PREFIX'] = os.environ.get('X_ACCEL_PREFIX', '/_protected')
+    app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', 'localhost')
+    app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 587))
+    app.config['SMTP_SECURITY'] = os.environ.get('SMTP_SECURITY', 'starttls')
+    app.config['SMTP_USERNAME'] = os.environ.get('SMTP_USERNAME')
+    app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
+    app.config['MAIL_SENDER'] = os.environ.get('FROM_EMAIL')
+    app.config['MAIL_RECIPIENT'] = os.environ.get('ADMIN_EMAIL')
+    app.config['MAIL_BATCH_SIZE'] = int(os.environ.get('MAIL_BATCH_SIZE', 50))
+    app.config['MAIL_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_MAX_ATTEMPTS', 8))
+    app.config['MAIL_IP_ATTEMPTS'] = int(os.environ.get('MAIL_IP_ATTEMPTS', 5))
+    app.config['MAIL_IP_PERIOD'] = int(os.environ.get('MAIL_IP_PERIOD', 3600))
+    app.config['LOGIN_IP_ATTEMPTS'] = int(os.environ.get('LOGIN_IP_ATTEMPTS', 10))
+    app.config['LOGIN_IP_PERIOD'] = int(os.environ.get('LOGIN_IP_PERIOD', 60))
+    app.config['LOGIN_USERNAME_ATTEMPTS'] = int(os.environ.get('LOGIN_USERNAME_ATTEMPTS', 5))
+    app.config['LOGIN_USERNAME_PERIOD'] = int(os.environ.get('LOGIN_USERNAME_PERIOD', 300))
+    # Keep password checks to fewer than the worker's request threads, so
+    # a burst of logins always leaves one thread for other requests.
+    threads = int(os.environ.get('GUNICORN_THREADS', 2))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', max(1, threads - 1)))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(2, app.config['PASSWORD_HASH_QUEUE'])))
+    app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 256))
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['QUERY_PROFILER'] = os.environ.get('QUERY_PROFILER', 'false').lower() == 'true'
+    app.config['QUERY_BUDGET_COUNT'] = int(os.environ.get('QUERY_BUDGET_COUNT', 20))
+    app.config['QUERY_BUDGET_MS'] = float(os.environ.get('QUERY_BUDGET_MS', 200))
+    app.config['QUERY_REPEAT_LIMIT'] = int(os.environ.get('QUERY_REPEAT_LIMIT', 5))
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    
+    # Number of proxies in front of the app whose X-Forwarded-For/-Proto to
+    # trust; login throttling keys on the client address this yields.
+    proxies = int(os.environ.get('TRUSTED_PROXIES', 0))
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
     
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    content_version.init_app(app)
+    response_cache.init_app(app)
+    response_compressor.init_app(app)
+    image_worker.init_app(app)
+    asset_manifest.init_app(app)
+    file_delivery.init_app(app)
+    email_outbox.init_app(app)
+    login_guard.init_app(app)
+    user_cache.init_app(app)
+    metrics.init_app(app)
+    query_profiler.init_app(app)
     
     login_manager.login_view = 'admin.login_page'
     
@@ -40,9 +129,25 @@ def create_app():
         from flask import redirect, url_for
         return redirect(url_for('admin.login_page'))
     
-    from app.routes import api, admin, frontend
+    from app.models import User, OutboxEmail, VersionStamp
+    content_version.watch(db.session, ignore=(User, OutboxEmail, VersionStamp))
+    user_cache.watch(db.session)
+    blob_storage.init_app(app)
+    
+    from app.routes import api, admin, frontend, health
     app.register_blueprint(api.bp)
     app.register_blueprint(admin.bp)
+    app.register_blueprint(health.bp)
     app.register_blueprint(frontend.bp)
     
+    from app.query_plans import check_query_plans_command
+    app.cli.add_command(check_query_plans_command)
+    from app.images import process_pending_images_command
+    app.cli.add_command(process_pending_images_command)
+    from app.assets import precompress_assets_command
+    app.cli.add_command(precompress_assets_command)
+    from app.benchmark import seed_benchmark_command, benchmark_command
+    app.cli.add_command(seed_benchmark_command)
+    app.cli.add_command(benchmark_command)
+    
     return app
@@ -0,0 +1,262 @@
+"""ASGI app for the public read API.
+
+The cached public GET endpoints of routes/api.py are rendered here on an
+asyncio engine, so a single process can hold thousands of keep-alive
+clients and have many queries in flight without a thread per request.
+Everything else is the Flask app's own: each request runs in a Flask
+request context with the same routing, response cache, ETags and
+compression (`api.CachedLookup`), the views call the same serializers
+through AsyncSession.run_sync, and the app's after_request hooks (CORS)
+apply to the response.
+
+Admin, writes and the frontend stay on WSGI. Requests for them are passed
+to the Flask app through asgiref's WsgiToAsgi when asgiref is installed;
+without it they get a 404 and the proxy has to route them to gunicorn.
+
+Needs SQLAlchemy's asyncio extra and an async driver: asyncpg for
+Postgres, aiosqlite for SQLite.
+"""
+import asyncio
+import io
+import sys
+
+from flask import abort, jsonify, make_response, request
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException, NotFound
+
+from app import content_version, db, serializers
+from app.models import Project, ResumeInfo, Folder
+from app.pool import async_database_uri, async_engine_options
+from app.routes import api
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # optional; without it only the public API is served
+    WsgiToAsgi = None
+
+
+async def _run(session, fn, *args, **kwargs):
+    """Call a sync helper from routes/api.py or serializers with `session`."""
+    return await session.run_sync(lambda sync_session: fn(*args, session=sync_session, **kwargs))
+
+
+async def _folder_dict(session, folder_id):
+    """The folder as Folder.to_dict() returns it, or None."""
+    statement = serializers.select_folders_with_counts().where(Folder.id == folder_id)
+    folders = await _run(session, serializers.folder_dicts, statement)
+    return folders[0] if folders else None
+
+
+async def get_projects(session):
+    return jsonify(await _run(session, api._active_projects))
+
+
+async def get_project(session, project_id):
+    project = await session.get(Project, project_id)
+    if project is None:
+        abort(404)
+    return jsonify(project.to_dict())
+
+
+async def get_resume(session):
+    resume = await session.scalar(db.select(ResumeInfo).limit(1))
+    if resume:
+        return jsonify(resume.to_dict())
+    return jsonify({'message': 'Resume info not found'}), 404
+
+
+async def get_links(session):
+    return jsonify(await _run(session, api._active_links))
+
+
+async def get_site_settings(session):
+    return jsonify(await _run(session, api._site_settings_dict))
+
+
+async def get_bootstrap(session):
+    return jsonify(await _run(session, api._bootstrap_dict))
+
+
+async def get_public_folders(session):
+    return jsonify(await _run(session, api._active_folders))
+
+
+async def get_folder_details(session, folder_id):
+    folder = await _folder_dict(session, folder_id)
+    if folder is None:
+        abort(404)
+    if not folder['is_active']:
+        return jsonify({'message': 'Folder not found'}), 404
+    return jsonify(folder)
+
+
+async def get_folder_work(session, folder_id):
+    folder = await session.get(Folder, folder_id)
+    if folder is None:
+        abort(404)
+    if not folder.is_active:
+        return jsonify({'message': 'Folder not found'}), 404
+
+    if request.args.get('all') == '1':
+        return jsonify(await _run(session, api._active_folder_items, folder_id))
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        cursor = api._decode_cursor(cursor)
+        if cursor is None:
+            return jsonify({'message': 'Invalid cursor'}), 400
+
+    items, next_cursor = await _run(session, api._active_folder_items, folder_id, api._page_limit(), cursor)
+    return jsonify({'items': items, 'next': next_cursor})
+
+
+async def get_folder_contents(session, folder_id):
+    folder = await _folder_dict(session, folder_id)
+    if folder is None:
+        abort(404)
+    if not folder['is_active']:
+        return jsonify({'message': 'Folder not found'}), 404
+
+    items, next_cursor = await _run(session, api._active_folder_items, folder_id, api._page_limit())
+    return jsonify({'folder': folder, 'items': items, 'next': next_cursor})
+
+
+# Flask endpoint -> async view. Each one mirrors the cached_response view
+# of the same name in routes/api.py.
+VIEWS = {
+    'api.get_projects': get_projects,
+    'api.get_project': get_project,
+    'api.get_resume': get_resume,
+    'api.get_links': get_links,
+    'api.get_site_settings': get_site_settings,
+    'api.get_bootstrap': get_bootstrap,
+    'api.get_public_folders': get_public_folders,
+    'api.get_folder_details': get_folder_details,
+    'api.get_folder_work': get_folder_work,
+    'api.get_folder_contents': get_folder_contents,
+}
+
+
+def _environ(scope):
+    """WSGI environ for an ASGI http scope, enough to build a Flask request."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+async def _send_response(response, environ, send):
+    headers = response.get_wsgi_headers(environ)
+    try:
+        body = b''.join(response.get_app_iter(environ))
+    finally:
+        response.close()
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class PublicAPI:
+    """ASGI callable serving the public read endpoints of a Flask app.
+
+    The async engine uses ASYNC_DATABASE_URI if set, else the app's
+    database URI with the async driver swapped in.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+        self.engine = create_async_engine(
+            app.config.get('ASYNC_DATABASE_URI') or async_database_uri(database_uri),
+            **async_engine_options(database_uri)
+        )
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.fallback = WsgiToAsgi(app) if WsgiToAsgi is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            environ = _environ(scope)
+            try:
+                endpoint, kwargs = self.app.url_map.bind_to_environ(environ).match()
+            except HTTPException:
+                endpoint = None
+            view = VIEWS.get(endpoint)
+            if view is not None:
+                await _send_response(await self._dispatch(environ, view, kwargs), environ, send)
+                return
+
+        if self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        elif scope['type'] == 'http':
+            await _send_response(NotFound().get_response(), _environ(scope), send)
+
+    async def _dispatch(self, environ, view, kwargs):
+        # The same steps as Flask's full_dispatch_request, with an awaited view.
+        with self.app.request_context(environ):
+            try:
+                try:
+                    response = self.app.preprocess_request()
+                    if response is None:
+                        response = await self._render(view, kwargs)
+                except Exception as e:
+                    response = self.app.handle_user_exception(e)
+                return self.app.finalize_request(response)
+            except Exception as e:
+                return self.app.handle_exception(e)
+
+    async def _render(self, view, kwargs):
+        stamp = content_version.recent_stamp()
+        if stamp is None:
+            # Re-reading the version is a blocking query; keep it off the loop.
+            stamp = await asyncio.to_thread(content_version.stamp)
+        lookup = api.CachedLookup(kwargs, stamp)
+        response = lookup.response()
+        if response is None:
+            async with self.sessionmaker() as session:
+                response = lookup.store(make_response(await view(session, **kwargs)))
+        return lookup.finish(response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,188 @@
+"""Serving of the exported Next.js frontend from an in-memory manifest.
+
+The `out/` directory is indexed once into a path -> entry map (size, mtime,
+content hash and any precompressed `.br`/`.gz` siblings), so requests never
+touch the filesystem to find out what exists. The manifest is rebuilt when
+the export directory is replaced by a new build.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import click
+from flask import request
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz variants are produced
+    brotli = None
+
+# Preference order when the client accepts several.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Build output under here has content hashes in its file names.
+IMMUTABLE_PREFIX = '_next/static/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.ico'}
+MIN_COMPRESS_SIZE = 1024
+
+
+class AssetEntry:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'mimetype', 'variants')
+
+    def __init__(self, path, stat, etag, variants):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        self.etag = etag
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        # encoding -> absolute path of the precompressed file
+        self.variants = variants
+
+
+def _file_hash(path):
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(root):
+    """Index every file under `root` by its URL path."""
+    entries = {}
+    for dirpath, _dirnames, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            if any(name.endswith(suffix) and name[:-len(suffix)] in names for _, suffix in ENCODINGS):
+                continue
+            path = os.path.join(dirpath, name)
+            variants = {
+                encoding: path + suffix
+                for encoding, suffix in ENCODINGS
+                if name + suffix in names
+            }
+            url_path = os.path.relpath(path, root).replace(os.sep, '/')
+            entries[url_path] = AssetEntry(path, os.stat(path), _file_hash(path), variants)
+    return entries
+
+
+def precompress_directory(root, level=9):
+    """Write .gz (and .br, if brotli is installed) next to compressible files.
+
+    Variants that wouldn't be smaller than the original are skipped.
+    Returns the number of files written.
+    """
+    written = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+
+            compressors = [('.gz', lambda d: gzip.compress(d, compresslevel=level, mtime=0))]
+            if brotli is not None:
+                compressors.append(('.br', lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in compressors:
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+class AssetManifest:
+    """Manifest of the static export, rebuilt when the export is replaced."""
+
+    def __init__(self):
+        self.root = None
+        self.check_interval = 2
+        self._entries = {}
+        self._stamp = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = os.path.normpath(app.config.setdefault(
+            'FRONTEND_DIR', os.path.join(app.root_path, '..', '..', 'out')
+        ))
+        self.check_interval = app.config.setdefault('ASSET_MANIFEST_CHECK_INTERVAL', 2)
+
+    def _current_stamp(self):
+        # `next build` recreates out/, which changes its inode and mtime.
+        try:
+            stat = os.stat(self.root)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def entries(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._entries
+        with self._lock:
+            self._checked_at = now
+            stamp = self._current_stamp()
+            if stamp != self._stamp:
+                self._entries = build_manifest(self.root) if stamp else {}
+                self._stamp = stamp
+        return self._entries
+
+    def get(self, path):
+        return self.entries().get(path)
+
+    def send(self, entry, cache_control=None):
+        """Respond with `entry`, picking the best precompressed variant the client accepts."""
+        from app import file_delivery
+
+        path, encoding = entry.path, None
+        if not file_delivery.proxy_negotiates_encoding:
+            for candidate, variant in entry.variants.items():
+                if request.accept_encodings[candidate] and (
+                    encoding is None or
+                    request.accept_encodings[candidate] > request.accept_encodings[encoding]
+                ):
+                    path, encoding = variant, candidate
+
+        response = file_delivery.send(
+            'frontend',
+            self.root,
+            os.path.relpath(path, self.root).replace(os.sep, '/'),
+            mimetype=entry.mimetype,
+            etag=entry.etag if encoding is None else f'{entry.etag}-{encoding}',
+            last_modified=entry.mtime,
+        )
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if entry.variants:
+            response.vary.add('Accept-Encoding')
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+        else:
+            # HTML and other unhashed files: always revalidate (cheap via ETag).
+            response.cache_control.no_cache = True
+        return response
+
+
+@click.command('precompress-assets')
+@with_appcontext
+def precompress_assets_command():
+    """Write .gz/.br copies of the frontend export for the static file server."""
+    from app import asset_manifest
+
+    written = precompress_directory(asset_manifest.root)
+    click.echo(f'Wrote {written} precompressed file(s) in {asset_manifest.root}.')
+    if brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written.')
@@ -0,0 +1,170 @@
+"""Login throttling and bounded password verification.
+
+Password hashes are slow to check by design, so a burst of login attempts
+could otherwise occupy every gunicorn thread. /admin/login takes a token
+from a per-IP and a per-username bucket before the user is even looked
+up, and answers 429 with Retry-After when either bucket is empty. Hashes
+are then checked on a small dedicated thread pool (hashlib releases the
+GIL while hashing). Once PASSWORD_HASH_QUEUE checks are already running or
+waiting, further logins are refused with a 503 at once instead of joining
+the queue. The queue defaults to one less than GUNICORN_THREADS, so logins
+can never hold every request thread of a worker.
+
+Buckets are kept in each process's memory. With several gunicorn workers
+an address can make up to `workers` times the configured attempts. Behind
+a reverse proxy every request comes from the proxy's address, so the
+per-IP bucket is shared by all clients unless TRUSTED_PROXIES is set.
+
+Authenticated requests get their User from `UserCache` rather than the
+database; see its docstring.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.security import check_password_hash
+
+from app.cache import ContentVersion, ResponseCache
+
+
+class VerifierBusy(Exception):
+    """Every password check slot is taken."""
+
+
+class TokenBucket:
+    """Per-key token buckets holding up to `capacity` tokens, refilled
+    at `capacity` per `period` seconds.
+
+    At most `max_keys` buckets are kept; the least recently used go first.
+    """
+
+    def __init__(self, capacity, period, max_keys=10000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Take a token for `key`. Returns 0 on success, else the seconds
+        until a token will be available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class LoginGuard:
+    """Attempt throttling and the password check pool for admin logins."""
+
+    def __init__(self):
+        self.by_ip = None
+        self.by_username = None
+        self.workers = 1
+        self.queue_size = 1
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.by_ip = TokenBucket(
+            app.config.setdefault('LOGIN_IP_ATTEMPTS', 10),
+            app.config.setdefault('LOGIN_IP_PERIOD', 60)
+        )
+        self.by_username = TokenBucket(
+            app.config.setdefault('LOGIN_USERNAME_ATTEMPTS', 5),
+            app.config.setdefault('LOGIN_USERNAME_PERIOD', 300)
+        )
+        self.queue_size = app.config.setdefault('PASSWORD_HASH_QUEUE', 1)
+        # Threads beyond the queue size could never be given work.
+        self.workers = min(app.config.setdefault('PASSWORD_HASH_WORKERS', 1), self.queue_size)
+
+    def _get_executor(self):
+        # Created lazily so each gunicorn worker gets its own threads after fork.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-check')
+                self._slots = threading.BoundedSemaphore(self.queue_size)
+            return self._executor
+
+    def throttle(self, ip, username):
+        """Count a login attempt. Returns 0 if it may proceed, else the
+        whole seconds to wait before retrying."""
+        wait = self.by_ip.take(ip)
+        if not wait:
+            wait = self.by_username.take(username.strip().lower())
+        return math.ceil(wait)
+
+    def succeeded(self, username):
+        """Forget the failed attempts against `username` after a good login."""
+        self.by_username.reset(username.strip().lower())
+
+    def verify(self, password_hash, password):
+        """check_password_hash on the check pool; raises VerifierBusy when it is full."""
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            return executor.submit(check_password_hash, password_hash, password).result()
+        finally:
+            self._slots.release()
+
+
+class UserCache:
+    """Column snapshots of recently loaded users, for the Flask-Login user loader.
+
+    Every @login_required request loads the session's user; a hit here
+    rebuilds it from the snapshot without a query. Entries expire after
+    USER_CACHE_TTL seconds, and any committed change to a user (password,
+    profile, deletion) bumps the shared 'users' version, which drops every
+    snapshot taken before it.
+    """
+
+    def __init__(self):
+        self.version = ContentVersion('users')
+        self._entries = ResponseCache()
+
+    def init_app(self, app):
+        self.version.init_app(app)
+        self._entries.max_entries = app.config.setdefault('USER_CACHE_MAX_ENTRIES', 256)
+        self._entries.ttl = app.config.setdefault('USER_CACHE_TTL', 60)
+
+    def watch(self, session):
+        from app.models import User
+
+        self.version.watch(session, only=(User,))
+
+    def load(self, user_id):
+        """The User with `user_id` in the current session, or None."""
+        from app import db
+        from app.models import User
+
+        version = self.version.current()
+        values = self._entries.get(user_id, version)
+        if values is None:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                values = {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+                self._entries.set(user_id, version, values)
+            return user
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        # No SELECT; reuses the session's instance if it already has one.
+        return db.session.merge(user, load=False)
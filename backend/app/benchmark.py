@@ -0,0 +1,405 @@
+"""Synthetic portfolio data and a repeatable benchmark of the HTTP routes.
+
+`flask --app wsgi seed-benchmark` fills an empty database with folders,
+design work (with derivative rows), projects and links, and writes a set
+of synthetic JPEGs into the upload folder for the items to point at. The
+data is generated from a fixed seed, so two databases seeded with the same
+options hold the same rows.
+
+`flask --app wsgi benchmark` then drives every public GET endpoint of
+routes/api.py, the contact form, the frontend's static routes and the two
+upload routes through the Flask test client, and prints one JSON document
+with, per route: latency percentiles, throughput, SQL statements per
+request and status codes, plus the process's peak RSS. The metadata block
+records the commit, database dialect and settings, so results from
+different commits or databases (SQLite vs Postgres via DATABASE_URL) can
+be diffed directly.
+
+Uploads add rows and files, so they run last; reseed before comparing a
+second run. Messages queued by the contact form are deleted again when the
+run ends.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import click
+import sqlalchemy
+from flask import current_app
+from flask.cli import with_appcontext
+from PIL import Image, ImageDraw
+
+from app.query_profiler import QueryRecorder
+from app.storage import URL_PREFIX
+
+PERCENTILES = (50, 90, 95, 99)
+# Rows per bulk insert while seeding.
+INSERT_BATCH = 1000
+
+
+def synthetic_image(rng, width, height, quality=85):
+    """JPEG bytes of a random arrangement of shapes, which compresses about
+    as well as real artwork does."""
+    image = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x, y = rng.randrange(width), rng.randrange(height)
+        box = (x, y, x + rng.randrange(width // 2 + 1), y + rng.randrange(height // 2 + 1))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle(box, fill=color)
+        else:
+            draw.ellipse(box, fill=color)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def _insert(model, rows):
+    from app import db
+
+    ids = []
+    for start in range(0, len(rows), INSERT_BATCH):
+        ids += db.session.scalars(db.insert(model).returning(model.id), rows[start:start + INSERT_BATCH]).all()
+    return ids
+
+
+def seed(folders=20, items=200, projects=50, links=20, images=50, image_size=(1600, 1200), seed=0):
+    """Add a synthetic portfolio to an empty database and commit it.
+
+    `items` design work rows go in each folder, every tenth one inactive,
+    and share `images` distinct files. Returns the number of rows added
+    per model.
+    """
+    from app import db
+    from app.models import (Blob, DesignWork, Folder, ImageDerivative, Project, ResumeInfo, SiteSettings,
+                            User, WebLink)
+
+    if db.session.scalar(db.select(Folder.id).limit(1)) is not None:
+        raise RuntimeError('The database already has folders; seed an empty database.')
+
+    rng = random.Random(seed)
+    width, height = image_size
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+
+    blobs = []
+    for _ in range(images):
+        data = synthetic_image(rng, width, height)
+        content_hash = hashlib.sha256(data).hexdigest()
+        filename = f'{content_hash}.jpg'
+        with open(os.path.join(upload_folder, filename), 'wb') as f:
+            f.write(data)
+        blobs.append({'hash': content_hash, 'filename': filename, 'size': len(data), 'ref_count': 0})
+
+    folder_ids = _insert(Folder, [
+        {'name': f'Folder {index + 1}', 'description': f'Synthetic folder {index + 1}',
+         'display_order': index, 'is_active': index % 10 != 9}
+        for index in range(folders)
+    ])
+
+    design_work = []
+    for folder_id in folder_ids:
+        for index in range(items):
+            blob = blobs[rng.randrange(len(blobs))]
+            blob['ref_count'] += 1
+            url = URL_PREFIX + blob['filename']
+            design_work.append({
+                'title': f'Design {folder_id}-{index + 1}',
+                'description': 'Synthetic design work',
+                'file_url': url,
+                'thumbnail_url': url,
+                'file_type': 'image/jpeg',
+                'file_size': blob['size'],
+                'width': width,
+                'height': height,
+                'tags': 'benchmark',
+                'display_order': index,
+                'is_active': index % 10 != 9,
+                'folder_id': folder_id,
+                'processing_status': 'ready',
+            })
+    item_ids = _insert(DesignWork, design_work)
+
+    derivatives = []
+    for item_id, item in zip(item_ids, design_work):
+        stem = item['file_url'].rsplit('.', 1)[0]
+        for fmt, ext in (('webp', 'webp'), ('jpeg', 'jpg')):
+            derivatives.append({
+                'design_work_id': item_id, 'format': fmt, 'width': 640,
+                'height': round(height * 640 / width), 'file_size': item['file_size'] // 4,
+                'url': f'{stem}_w640.{ext}',
+            })
+    _insert(ImageDerivative, derivatives)
+
+    db.session.execute(db.insert(Blob), [blob for blob in blobs if blob['ref_count']])
+    _insert(Project, [
+        {'title': f'Project {index + 1}', 'description': 'Synthetic project ' * 20,
+         'technologies': 'Python, Flask, PostgreSQL', 'github_url': f'https://github.com/example/project-{index}',
+         'display_order': index, 'is_active': index % 10 != 9}
+        for index in range(projects)
+    ])
+    _insert(WebLink, [
+        {'title': f'Link {index + 1}', 'url': f'https://example.com/{index}', 'display_order': index}
+        for index in range(links)
+    ])
+
+    counts = {'folders': folders, 'design_work': len(design_work), 'derivatives': len(derivatives),
+              'blobs': len(blobs), 'projects': projects, 'links': links}
+    if db.session.scalar(db.select(SiteSettings.id).limit(1)) is None:
+        db.session.add(SiteSettings())
+    if db.session.scalar(db.select(ResumeInfo.id).limit(1)) is None:
+        db.session.add(ResumeInfo(full_name='Benchmark', title='Designer', summary='Synthetic resume'))
+    if db.session.scalar(db.select(User.id).limit(1)) is None:
+        user = User(username='benchmark', email='benchmark@example.com')
+        user.set_password(os.urandom(16).hex())
+        db.session.add(user)
+    db.session.commit()
+    return counts
+
+
+def _percentile(ordered, percent):
+    # Nearest rank.
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def peak_rss():
+    """Peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(send, iterations, warmup=0):
+    """Call `send(i)` (returning a test client response) `warmup` times
+    untimed, then `iterations` times, and summarize the timed calls.
+
+    Each call gets its own app context, as a real request would; otherwise
+    the request would share the caller's context and database session.
+    """
+    app = current_app._get_current_object()
+    for index in range(warmup):
+        with app.app_context():
+            send(index).close()
+    latencies = []
+    statements = []
+    statuses = Counter()
+    started = time.perf_counter()
+    for index in range(iterations):
+        with app.app_context(), QueryRecorder(trace=False) as recorder:
+            request_started = time.perf_counter()
+            response = send(warmup + index)
+            latencies.append(time.perf_counter() - request_started)
+        statuses[str(response.status_code)] += 1
+        response.close()
+        statements.append(recorder.count)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        'requests': iterations,
+        'statuses': dict(statuses),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'latency_ms': {'mean': round(sum(latencies) / iterations * 1000, 3)},
+        'queries_per_request': {'mean': round(sum(statements) / iterations, 2), 'max': max(statements)},
+        'peak_rss_bytes': peak_rss(),
+    }
+    for percent in PERCENTILES:
+        result['latency_ms'][f'p{percent}'] = round(_percentile(latencies, percent) * 1000, 3)
+    result['latency_ms']['max'] = round(latencies[-1] * 1000, 3)
+    return result
+
+
+def _cycle(values):
+    return lambda index: values[index % len(values)]
+
+
+def scenarios(client, image_size=(1600, 1200), upload_batch=5, uploads=True):
+    """(name, send) pairs for every benchmarked route, uploads last."""
+    from app import asset_manifest, db
+    from app.models import Folder, Project, User
+
+    folder_ids = db.session.scalars(
+        db.select(Folder.id).where(Folder.is_active == True).order_by(Folder.display_order)
+    ).all()
+    project_ids = db.session.scalars(db.select(Project.id).where(Project.is_active == True)).all()
+    if not folder_ids or not project_ids:
+        raise RuntimeError('No active folders or projects; run seed-benchmark first.')
+    folder = _cycle(folder_ids)
+    project = _cycle(project_ids)
+    # Second pages, so keyset pagination is measured too.
+    cursors = [(folder_id, client.get(f'/api/folders/{folder_id}/work').get_json()['next'])
+               for folder_id in folder_ids]
+    cursors = _cycle([(folder_id, cursor) for folder_id, cursor in cursors if cursor] or [(folder_ids[0], '')])
+
+    def get(path):
+        return lambda index: client.get(path(index), buffered=True)
+
+    routes = [
+        ('api.get_projects', get(lambda i: '/api/projects')),
+        ('api.get_project', get(lambda i: f'/api/projects/{project(i)}')),
+        ('api.get_resume', get(lambda i: '/api/resume')),
+        ('api.get_links', get(lambda i: '/api/links')),
+        ('api.get_site_settings', get(lambda i: '/api/site-settings')),
+        ('api.get_bootstrap', get(lambda i: '/api/bootstrap')),
+        ('api.get_public_folders', get(lambda i: '/api/folders')),
+        ('api.get_folder_details', get(lambda i: f'/api/folders/{folder(i)}')),
+        ('api.get_folder_work', get(lambda i: f'/api/folders/{folder(i)}/work')),
+        ('api.get_folder_work (next page)', get(lambda i: '/api/folders/{}/work?cursor={}'.format(*cursors(i)))),
+        ('api.get_folder_work (all)', get(lambda i: f'/api/folders/{folder(i)}/work?all=1')),
+        ('api.get_folder_contents', get(lambda i: f'/api/folders/{folder(i)}/contents')),
+        # One client address per message, so the per-address mail throttle
+        # doesn't turn the run into a measure of 429s.
+        ('api.send_email', lambda i: client.post('/api/send-email', json={
+            'from': f'visitor{i}@example.com', 'subject': 'Benchmark', 'message': 'Hello ' * 50,
+        }, environ_base={'REMOTE_ADDR': '10.{}.{}.{}'.format(*(i + 1).to_bytes(3, 'big'))})),
+        ('frontend.index', get(lambda i: '/')),
+        ('frontend.serve_static (page)', get(lambda i: '/about')),
+    ]
+    assets = sorted(path for path in asset_manifest.entries() if path.startswith('_next/'))
+    if assets:
+        routes.append(('frontend.serve_static (asset)', get(_cycle(assets))))
+
+    if uploads:
+        user_id = db.session.scalar(db.select(User.id).order_by(User.id).limit(1))
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        rng = random.Random(1)
+        width, height = image_size
+        # Distinct files, so each upload stores a new blob rather than
+        # taking a reference on an existing one.
+        images = [synthetic_image(rng, width, height) for _ in range(8)]
+
+        def image(index, slot=0):
+            return images[(index + slot) % len(images)] + index.to_bytes(4, 'big') + bytes([slot])
+
+        routes += [
+            ('admin.upload_image', lambda i: client.post('/admin/upload-image', data={
+                'file': (io.BytesIO(image(i)), f'upload-{i}.jpg', 'image/jpeg'),
+            })),
+            ('api.upload_to_folder', lambda i: client.post(f'/api/folders/{folder(i)}/upload', data={
+                'files': [(io.BytesIO(image(i, slot)), f'batch-{i}-{slot}.jpg', 'image/jpeg')
+                          for slot in range(1, upload_batch + 1)],
+            })),
+        ]
+    return routes
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=current_app.root_path, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(iterations=200, warmup=20, cold=False, uploads=True, upload_iterations=None, upload_batch=5,
+        image_size=(1600, 1200)):
+    """Benchmark every route in `scenarios` and return the results as a dict.
+
+    `cold` disables the response cache so each request renders from the
+    database. Uploads run `upload_iterations` times (default
+    `iterations // 10`) without warmup.
+    """
+    from app import db, response_cache
+    from app.models import DesignWork, Folder, OutboxEmail, Project
+
+    app = current_app._get_current_object()
+    if cold:
+        response_cache.max_entries = 0
+        response_cache.clear()
+    client = app.test_client()
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'database': db.engine.dialect.name,
+            'dataset': {
+                'folders': db.session.scalar(db.select(db.func.count(Folder.id))),
+                'design_work': db.session.scalar(db.select(db.func.count(DesignWork.id))),
+                'projects': db.session.scalar(db.select(db.func.count(Project.id))),
+            },
+            'settings': {
+                'iterations': iterations,
+                'warmup': warmup,
+                'response_cache': not cold and bool(response_cache.max_entries),
+                'upload_batch': upload_batch,
+                'image_workers': app.config['IMAGE_WORKERS'],
+            },
+        },
+        'routes': {},
+    }
+    last_email = db.session.scalar(db.select(db.func.max(OutboxEmail.id))) or 0
+    try:
+        for name, send in scenarios(client, image_size, upload_batch, uploads):
+            if name.startswith(('admin.upload', 'api.upload')):
+                results['routes'][name] = measure(send, upload_iterations or max(1, iterations // 10))
+            else:
+                results['routes'][name] = measure(send, iterations, warmup)
+    finally:
+        # Drop the contact form messages the run queued, before `flask
+        # send-emails` gets to deliver them.
+        db.session.execute(db.delete(OutboxEmail).where(OutboxEmail.id > last_email))
+        db.session.commit()
+    results['peak_rss_bytes'] = peak_rss()
+    return results
+
+
+def _size(value):
+    width, _, height = value.partition('x')
+    return int(width), int(height)
+
+
+@click.command('seed-benchmark')
+@click.option('--folders', default=20, show_default=True, help='Folders to create.')
+@click.option('--items', default=200, show_default=True, help='Design work items per folder.')
+@click.option('--projects', default=50, show_default=True)
+@click.option('--links', default=20, show_default=True)
+@click.option('--images', default=50, show_default=True, help='Distinct image files shared by the items.')
+@click.option('--image-size', default='1600x1200', show_default=True, help='WIDTHxHEIGHT of the images.')
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='Random seed.')
+@with_appcontext
+def seed_benchmark_command(folders, items, projects, links, images, image_size, seed_value):
+    """Fill an empty database with a synthetic portfolio for benchmarking."""
+    from app import db
+
+    db.create_all()
+    try:
+        counts = seed(folders, items, projects, links, images, _size(image_size), seed_value)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo('Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items()) + '.')
+
+
+@click.command('benchmark')
+@click.option('--iterations', default=200, show_default=True, help='Timed requests per route.')
+@click.option('--warmup', default=20, show_default=True, help='Untimed requests per route first.')
+@click.option('--cold', is_flag=True, help='Disable the response cache.')
+@click.option('--skip-uploads', is_flag=True, help="Don't benchmark the upload routes.")
+@click.option('--upload-iterations', type=int, help='Timed uploads per route [default: iterations / 10].')
+@click.option('--upload-batch', default=5, show_default=True, help='Files per folder upload request.')
+@click.option('--image-size', default='1600x1200', show_default=True, help='WIDTHxHEIGHT of uploaded images.')
+@click.option('--output', type=click.File('w'), default='-', help='File for the JSON results [default: stdout].')
+@with_appcontext
+def benchmark_command(iterations, warmup, cold, skip_uploads, upload_iterations, upload_batch, image_size, output):
+    """Benchmark the API, frontend and upload routes and write JSON results."""
+    try:
+        results = run(iterations, warmup, cold, not skip_uploads, upload_iterations, upload_batch, _size(image_size))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    json.dump(results, output, indent=2)
+    output.write('\n')
@@ -0,0 +1,219 @@
+"""In-process cache for serialized public API responses.
+
+Cached bodies are tagged with the content version they were rendered at.
+Any committed change to site content bumps the version, which drops every
+entry rendered before it.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+
+class ContentVersion:
+    """Version stamp for one kind of data, shared by all workers and hosts.
+
+    The version is a row of version_stamps, incremented in the same
+    transaction as the change it stands for, so every instance behind the
+    load balancer agrees on it. Each process re-reads it at most every
+    VERSION_CHECK_INTERVAL seconds: other processes and hosts see a change
+    within that time, the process that made it at once. The first version
+    is a nanosecond timestamp, so versions (and the ETags made from them)
+    aren't reused after the database is recreated.
+
+    Incrementing locks the row until the transaction ends, which serializes
+    concurrent content writes; they only come from the admin.
+    """
+
+    def __init__(self, name='content'):
+        self.name = name
+        self.check_interval = 1.0
+        self._stamp = None
+        self._checked_at = -math.inf
+        self._watched = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.check_interval = app.config.setdefault('VERSION_CHECK_INTERVAL', 1.0)
+
+    def _read(self):
+        from app import db
+        from app.models import VersionStamp
+
+        query = select(VersionStamp.version, VersionStamp.updated_at).where(VersionStamp.name == self.name)
+        with db.engine.connect() as connection:
+            row = connection.execute(query).first()
+            if row is None:
+                try:
+                    connection.execute(insert(VersionStamp).values(
+                        name=self.name, version=time.time_ns(), updated_at=datetime.utcnow()
+                    ))
+                    connection.commit()
+                except IntegrityError:
+                    # Another worker created it first.
+                    connection.rollback()
+                row = connection.execute(query).first()
+        return row.version, row.updated_at.replace(tzinfo=timezone.utc)
+
+    def recent_stamp(self):
+        """The stamp if it was read within `check_interval`, else None.
+
+        Lets async callers skip a thread hop when `stamp` wouldn't query.
+        """
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._stamp
+        return None
+
+    def stamp(self):
+        """(version, time of the last change) as of at most `check_interval` seconds ago."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._stamp = self._read()
+                    self._checked_at = time.monotonic()
+        return self._stamp
+
+    def current(self):
+        return self.stamp()[0]
+
+    def _bump(self, connection):
+        from app.models import VersionStamp
+
+        result = connection.execute(
+            update(VersionStamp).where(VersionStamp.name == self.name)
+            .values(version=VersionStamp.version + 1, updated_at=datetime.utcnow())
+        )
+        if not result.rowcount:
+            connection.execute(insert(VersionStamp).values(
+                name=self.name, version=time.time_ns(), updated_at=datetime.utcnow()
+            ))
+
+    def watch(self, session, ignore=(), only=None):
+        """Bump the version whenever `session` commits a change to content.
+
+        Changes that only touch models listed in `ignore` (e.g. users) leave
+        the version alone; with `only`, changes to other models do. Watching
+        the same session twice is a no-op.
+        """
+        if any(watched is session for watched in self._watched):
+            return
+        self._watched.append(session)
+
+        # Per instance, so several versions can watch one session.
+        changed = ('content_changed', id(self))
+
+        def is_content(cls):
+            if only is not None:
+                return issubclass(cls, only)
+            return not issubclass(cls, ignore)
+
+        def changing(session):
+            # Once per transaction, in the transaction itself.
+            if not session.info.get(changed):
+                session.info[changed] = True
+                self._bump(session.connection())
+
+        def after_flush(session, flush_context):
+            objects = chain(session.new, session.dirty, session.deleted)
+            if any(is_content(type(obj)) for obj in objects):
+                changing(session)
+
+        def do_orm_execute(state):
+            # Bulk UPDATE/DELETE/INSERT statements skip the flush entirely.
+            if state.is_update or state.is_delete or state.is_insert:
+                if any(is_content(mapper.class_) for mapper in state.all_mappers):
+                    changing(state.session)
+
+        def after_commit(session):
+            if session.info.pop(changed, False):
+                # Re-read on next use rather than wait out the interval.
+                self._checked_at = -math.inf
+
+        def after_rollback(session):
+            session.info.pop(changed, None)
+
+        for name, fn in (('after_flush', after_flush),
+                         ('do_orm_execute', do_orm_execute),
+                         ('after_commit', after_commit),
+                         ('after_rollback', after_rollback)):
+            event.listen(session, name, fn)
+
+
+def version_etag(version):
+    """Strong ETag for a response rendered at `version`."""
+    return f'v{version:x}'
+
+
+def version_last_modified(updated_at):
+    """Last-Modified for content last changed at `updated_at`, or None until it is safe to send.
+
+    HTTP dates have whole-second resolution. Rounding up, and withholding
+    the date until that second has passed, means any later write gets a
+    later Last-Modified, so an If-Modified-Since match is never stale.
+    """
+    last_modified = updated_at.replace(microsecond=0)
+    if last_modified != updated_at:
+        last_modified += timedelta(seconds=1)
+    if last_modified > datetime.now(timezone.utc):
+        return None
+    return last_modified
+
+
+class ResponseCache:
+    """Size-bounded LRU of response bodies with per-entry TTL."""
+
+    def __init__(self):
+        self.max_entries = 0
+        self.ttl = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.setdefault('API_CACHE_MAX_ENTRIES', 512)
+        self.ttl = app.config.setdefault('API_CACHE_TTL', 300)
+
+    def _sync(self, version):
+        # Caller holds the lock. Returns False if `version` is already stale.
+        if version == self._version:
+            return True
+        if self._version is not None and version < self._version:
+            return False
+        self._entries.clear()
+        self._version = version
+        return True
+
+    def get(self, key, version):
+        if not self.max_entries:
+            return None
+        with self._lock:
+            if not self._sync(version):
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            if not self._sync(version):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,98 @@
+"""Negotiated gzip/brotli compression for dynamic responses.
+
+Bodies at or above COMPRESS_MIN_SIZE are compressed with the best encoding
+the client accepts. Each encoding gets its own ETag (`<etag>-gzip`), as a
+compressed body is a different representation. Callers that cache response
+bodies pass in a dict of already encoded variants, which is filled in on
+first use so a cached body is compressed once per encoding, not per hit.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+
+class ResponseCompressor:
+
+    def __init__(self):
+        self.min_size = 500
+        self.level = 6
+        self.brotli_quality = 4
+
+    def init_app(self, app):
+        self.min_size = app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.setdefault('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    @property
+    def encodings(self):
+        """Supported encodings, most preferred first."""
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self):
+        best = None
+        for encoding in self.encodings:
+            quality = request.accept_encodings[encoding]
+            if quality and (best is None or quality > request.accept_encodings[best]):
+                best = encoding
+        return best
+
+    def encode(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def etags(self, etag):
+        """Every ETag a client may hold for the representations of `etag`."""
+        return [etag] + [f'{etag}-{encoding}' for encoding in self.encodings]
+
+    def compress(self, response, variants=None):
+        """Compress `response` in place if the client and the body allow it.
+
+        Usable directly as an after_request hook. `variants` maps encodings
+        to encoded bodies and is updated with any encoding produced here.
+        """
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        etag, weak = response.get_etag()
+        if response.status_code == 304:
+            # Echo the validator of the representation the client holds.
+            encoding = self.negotiate()
+            if etag and encoding and request.if_none_match.contains(f'{etag}-{encoding}'):
+                response.set_etag(f'{etag}-{encoding}', weak)
+            response.vary.add('Accept-Encoding')
+            return response
+        if response.status_code != 200:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if variants is not None and encoding in variants:
+            compressed = variants[encoding]
+        else:
+            compressed = self.encode(data, encoding)
+            if variants is not None:
+                variants[encoding] = compressed
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
@@ -0,0 +1,69 @@
+"""File responses for uploads and frontend media.
+
+FILE_DELIVERY picks who moves the bytes:
+
+- unset: the app, via send_file. Conditional and Range requests are
+  answered with 304/206. A 206 body is handed to the server's
+  wsgi.file_wrapper positioned at the range start, so gunicorn can still
+  use sendfile(2) instead of reading the range through Python.
+- 'x-accel': nginx. The response carries an X-Accel-Redirect to
+  `X_ACCEL_PREFIX/<location>/<filename>`, which must be an internal
+  location aliased to the same directory.
+- 'x-sendfile': Apache/lighttpd, through Flask's USE_X_SENDFILE.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+MODES = (None, 'x-accel', 'x-sendfile')
+
+
+class FileDelivery:
+
+    def __init__(self):
+        self.mode = None
+        self.accel_prefix = '/_protected'
+
+    def init_app(self, app):
+        self.mode = app.config.setdefault('FILE_DELIVERY', None) or None
+        if self.mode not in MODES:
+            raise ValueError(f'FILE_DELIVERY must be one of {MODES}, not {self.mode!r}')
+        self.accel_prefix = app.config.setdefault('X_ACCEL_PREFIX', '/_protected').rstrip('/')
+        if self.mode == 'x-sendfile':
+            app.config['USE_X_SENDFILE'] = True
+
+    @property
+    def proxy_negotiates_encoding(self):
+        """True when the proxy picks precompressed variants itself (nginx gzip_static)."""
+        return self.mode == 'x-accel'
+
+    def send(self, location, root, filename, mimetype=None, etag=True, last_modified=None):
+        """Respond with `root/filename`; `location` names the directory for X-Accel-Redirect."""
+        path = safe_join(root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        if self.mode == 'x-accel':
+            # nginx keeps the Content-Type set here, so guess it like send_file does.
+            mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = quote(f'{self.accel_prefix}/{location}/{filename}')
+            return response
+
+        response = send_file(path, mimetype=mimetype, etag=etag, last_modified=last_modified, conditional=True)
+        return self._sendfile_range(response, path)
+
+    def _sendfile_range(self, response, path):
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if response.status_code != 206 or file_wrapper is None or response.is_sequence:
+            return response
+        # The server sends Content-Length bytes from the file's current
+        # offset, which is exactly the requested range.
+        response.response.close()
+        f = open(path, 'rb')
+        f.seek(response.content_range.start)
+        response.response = file_wrapper(f, 64 * 1024)
+        return response
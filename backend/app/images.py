@@ -0,0 +1,223 @@
+"""Background processing of uploaded design work images.
+
+Uploads only persist the original file and a DesignWork row in 'pending'
+state. Decoding, measuring, thumbnailing and the responsive derivative set
+are produced in a process pool, off the gunicorn request threads, and the
+row is marked 'ready' (or 'failed') when the job finishes.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import click
+from flask.cli import with_appcontext
+from PIL import Image, ImageOps, features
+
+THUMBNAIL_SIZE = (200, 200)
+DERIVATIVE_WIDTHS = (320, 640, 1280, 1920)
+
+SAVE_OPTIONS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+}
+
+
+def derivative_formats(has_alpha):
+    """Output formats, most efficient first, ending with a universal fallback."""
+    formats = ['webp', 'png' if has_alpha else 'jpeg']
+    if features.check('avif'):
+        formats.insert(0, 'avif')
+    return formats
+
+
+def derivative_widths(width, widths=DERIVATIVE_WIDTHS):
+    """Target widths for an image `width` pixels wide; never upscales."""
+    targets = [w for w in widths if w < width]
+    if width <= max(widths):
+        targets.append(width)
+    return targets
+
+
+def process_image(upload_folder, filename, widths=DERIVATIVE_WIDTHS):
+    """Measure an uploaded image and write its thumbnail and derivatives.
+
+    Runs in a worker process, so it only touches the filesystem; the caller
+    records the result in the database.
+    """
+    stem = filename.rsplit('.', 1)[0]
+    thumbnail_filename = f"thumb_{filename}"
+    derivatives = []
+
+    with Image.open(os.path.join(upload_folder, filename)) as original:
+        img = ImageOps.exif_transpose(original)
+        width, height = img.size
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+
+        thumbnail = img.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZE)
+        thumbnail.save(os.path.join(upload_folder, thumbnail_filename))
+
+        for target in derivative_widths(width, widths):
+            target_height = max(1, round(height * target / width))
+            resized = img if target == width else img.resize((target, target_height), Image.LANCZOS)
+            for fmt in derivative_formats(has_alpha):
+                derivative_filename = f"{stem}_w{target}.{'jpg' if fmt == 'jpeg' else fmt}"
+                path = os.path.join(upload_folder, derivative_filename)
+                resized.save(path, fmt.upper(), **SAVE_OPTIONS[fmt])
+                derivatives.append({
+                    'format': fmt,
+                    'width': target,
+                    'height': target_height,
+                    'file_size': os.path.getsize(path),
+                    'filename': derivative_filename,
+                })
+
+    return {
+        'width': width,
+        'height': height,
+        'thumbnail_filename': thumbnail_filename,
+        'derivatives': derivatives,
+    }
+
+
+class ImageWorker:
+    """Process pool that generates derivatives for DesignWork uploads."""
+
+    def __init__(self):
+        self.app = None
+        self.max_workers = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.setdefault('IMAGE_WORKERS', 2)
+        self.widths = tuple(app.config.setdefault('IMAGE_DERIVATIVE_WIDTHS', DERIVATIVE_WIDTHS))
+
+    def _get_executor(self):
+        # Created lazily so each gunicorn worker gets its own pool after fork.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, item, inline=False):
+        """Queue a committed DesignWork row for processing.
+
+        With `inline` (or IMAGE_WORKERS=0) the job runs in the calling thread.
+        """
+        self.submit_many([item], inline=inline)
+
+    def submit_many(self, items, inline=False):
+        """`submit` for a batch of committed rows.
+
+        Rows whose file was already processed for another row (the same
+        content uploaded again) reuse its results; the rest are queued.
+        """
+        # Rows sharing a stored file are processed once, by a single job.
+        batches = {}
+        for item in self._reuse_processed(items):
+            batches.setdefault(item.file_url.rsplit('/', 1)[-1], []).append(item.id)
+        upload_folder = os.path.abspath(self.app.config['UPLOAD_FOLDER'])
+
+        for filename, item_ids in batches.items():
+            job = partial(process_image, upload_folder, filename, self.widths)
+            if inline or not self.max_workers:
+                self._finish(item_ids, job)
+                continue
+            future = self._get_executor().submit(job)
+            future.add_done_callback(partial(self._finish_future, item_ids))
+
+    def _finish_future(self, item_ids, future):
+        self._finish(item_ids, future.result)
+
+    def _reuse_processed(self, items):
+        """Copy derivatives onto rows whose stored file another row already processed.
+
+        Content-addressed storage means a re-upload points at the same file,
+        so its derivatives already exist on disk. Returns the rows that still
+        need processing.
+        """
+        from app import db
+        from app.models import DesignWork, ImageDerivative
+
+        ids = [item.id for item in items]
+        sources = {}
+        for source in DesignWork.query.filter(
+            DesignWork.file_url.in_({item.file_url for item in items}),
+            DesignWork.id.notin_(ids),
+            DesignWork.processing_status == 'ready'
+        ):
+            sources.setdefault(source.file_url, source)
+        if not sources:
+            return items
+
+        remaining = []
+        for item in items:
+            source = sources.get(item.file_url)
+            if source is None:
+                remaining.append(item)
+                continue
+            item.width = source.width
+            item.height = source.height
+            item.thumbnail_url = source.thumbnail_url
+            item.derivatives = [
+                ImageDerivative(format=d.format, width=d.width, height=d.height, file_size=d.file_size, url=d.url)
+                for d in source.derivatives
+            ]
+            item.processing_status = 'ready'
+        db.session.commit()
+        return remaining
+
+    def _finish(self, item_ids, result):
+        from app import db
+        from app.models import DesignWork, ImageDerivative
+
+        with self.app.app_context():
+            items = DesignWork.query.filter(DesignWork.id.in_(item_ids)).all()
+            if not items:
+                return
+            try:
+                processed = result()
+            except Exception:
+                self.app.logger.exception('Image processing failed for design work %s', item_ids)
+                for item in items:
+                    item.processing_status = 'failed'
+            else:
+                for item in items:
+                    url_prefix = item.file_url.rsplit('/', 1)[0]
+                    item.width = processed['width']
+                    item.height = processed['height']
+                    item.thumbnail_url = f"{url_prefix}/{processed['thumbnail_filename']}"
+                    item.derivatives = [
+                        ImageDerivative(
+                            format=d['format'],
+                            width=d['width'],
+                            height=d['height'],
+                            file_size=d['file_size'],
+                            url=f"{url_prefix}/{d['filename']}"
+                        )
+                        for d in processed['derivatives']
+                    ]
+                    item.processing_status = 'ready'
+            db.session.commit()
+
+
+@click.command('process-pending-images')
+@with_appcontext
+def process_pending_images_command():
+    """Re-run image processing for uploads left pending or failed."""
+    from app import image_worker
+    from app.models import DesignWork
+
+    items = DesignWork.query.filter(DesignWork.processing_status.in_(['pending', 'failed'])).all()
+    image_worker.submit_many(items, inline=True)
+    click.echo(f'Processed {len(items)} image(s).')
@@ -0,0 +1,42 @@
+"""Flask JSON provider backed by orjson, when it is installed.
+
+Output matches Flask's default provider: sorted keys, compact separators
+(indented in debug), and datetimes/dataclasses/UUIDs encoded by Flask's own
+`default` hook. The one difference is that non-ASCII characters are written
+as UTF-8 instead of \\u escapes, which decodes to the same values.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; Flask's json-based provider is used without it
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+
+    def _options(self, indent=False):
+        options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME |
+                   orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS)
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for json.dumps-specific options get the stdlib encoder.
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
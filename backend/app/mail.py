@@ -0,0 +1,301 @@
+"""Queued delivery of contact form email.
+
+/api/send-email only inserts an email_outbox row and answers 202 once it
+is committed, so no request thread waits on SMTP. Each client address may
+queue MAIL_IP_ATTEMPTS messages per MAIL_IP_PERIOD seconds, and nothing
+is queued while there is no recipient to deliver to. A separate sender
+process (`flask --app wsgi send-emails`) claims due rows in batches,
+delivers them over one long-lived SMTP connection and records the
+outcome. Transient failures are retried with exponential backoff; 5xx
+replies and exhausted retries mark the row 'failed'.
+
+Claiming a row moves its next_attempt_at forward by MAIL_CLAIM_LEASE
+before anything is sent, so rows held by a sender that dies mid-batch are
+picked up again once the lease runs out. On Postgres the claim uses
+FOR UPDATE SKIP LOCKED, so several senders can run side by side; on
+SQLite run only one.
+"""
+import math
+import random
+import smtplib
+import ssl
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+import click
+from flask.cli import with_appcontext
+
+from app.auth import TokenBucket
+
+SECURITY_MODES = ('starttls', 'ssl', 'none')
+
+
+class MailNotConfigured(Exception):
+    """There is no recipient (or sender) to deliver contact form email with."""
+
+
+def default_smtp_factory(config):
+    """Connection factory for the SMTP_* settings in `config`."""
+    def connect():
+        security = config['SMTP_SECURITY']
+        if security == 'ssl':
+            smtp = smtplib.SMTP_SSL(config['SMTP_HOST'], config['SMTP_PORT'], timeout=config['SMTP_TIMEOUT'],
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(config['SMTP_HOST'], config['SMTP_PORT'], timeout=config['SMTP_TIMEOUT'])
+            if security == 'starttls':
+                smtp.starttls(context=ssl.create_default_context())
+        if config['SMTP_USERNAME']:
+            smtp.login(config['SMTP_USERNAME'], config['SMTP_PASSWORD'])
+        return smtp
+    return connect
+
+
+class SMTPConnection:
+    """A reusable SMTP connection from `factory`.
+
+    Opened on first use, kept open across batches and reopened after an
+    error or after `idle_timeout` seconds unused (servers drop idle
+    clients, usually after a few minutes).
+    """
+
+    def __init__(self, factory, idle_timeout=60):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self._smtp = None
+        self._last_used = 0.0
+
+    def send(self, message):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._smtp is None:
+            self._smtp = self.factory()
+        try:
+            self._smtp.send_message(message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # Refused by the server; smtplib has reset the transaction and
+            # the connection is still good.
+            self._last_used = time.monotonic()
+            raise
+        except OSError:
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+def is_permanent(error):
+    """True if retrying `error` can't help (5xx reply, every recipient refused)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class EmailOutbox:
+    """The email_outbox table and the sender that drains it."""
+
+    def __init__(self):
+        self.app = None
+        self.smtp_factory = None
+        self.by_ip = None
+        self.batch_size = 50
+        self.max_attempts = 8
+        self.retry_delay = 30
+        self.max_retry_delay = 3600
+        self.claim_lease = 300
+
+    def init_app(self, app, smtp_factory=None):
+        """`smtp_factory` is a callable returning a connected smtplib.SMTP-like
+        object; it defaults to one built from the SMTP_* settings."""
+        self.app = app
+        if app.config.setdefault('SMTP_SECURITY', 'starttls') not in SECURITY_MODES:
+            raise ValueError(f"SMTP_SECURITY must be one of {SECURITY_MODES}, not {app.config['SMTP_SECURITY']!r}")
+        app.config.setdefault('SMTP_HOST', 'localhost')
+        app.config.setdefault('SMTP_PORT', 587)
+        app.config.setdefault('SMTP_USERNAME', None)
+        app.config.setdefault('SMTP_PASSWORD', None)
+        app.config.setdefault('SMTP_TIMEOUT', 30)
+        app.config.setdefault('MAIL_SENDER', None)
+        app.config.setdefault('MAIL_RECIPIENT', None)
+        self.batch_size = app.config.setdefault('MAIL_BATCH_SIZE', 50)
+        self.max_attempts = app.config.setdefault('MAIL_MAX_ATTEMPTS', 8)
+        self.retry_delay = app.config.setdefault('MAIL_RETRY_DELAY', 30)
+        self.max_retry_delay = app.config.setdefault('MAIL_MAX_RETRY_DELAY', 3600)
+        self.claim_lease = app.config.setdefault('MAIL_CLAIM_LEASE', 300)
+        self.by_ip = TokenBucket(
+            app.config.setdefault('MAIL_IP_ATTEMPTS', 5),
+            app.config.setdefault('MAIL_IP_PERIOD', 3600)
+        )
+        self.smtp_factory = smtp_factory or default_smtp_factory(app.config)
+        app.cli.add_command(send_emails_command)
+
+    def throttle(self, ip):
+        """Count a message from `ip`. Returns 0 if it may be queued, else the
+        whole seconds to wait before retrying."""
+        return math.ceil(self.by_ip.take(ip))
+
+    def enqueue(self, from_email, subject, message):
+        """Store a message for delivery and commit it.
+
+        Raises MailNotConfigured when there is nobody to deliver it to.
+        """
+        from app import db
+        from app.models import OutboxEmail
+
+        self._recipient()
+        email = OutboxEmail(from_email=from_email, subject=subject, message=message)
+        db.session.add(email)
+        db.session.commit()
+        return email
+
+    def retry_after(self, attempts):
+        """Backoff before attempt `attempts + 1`: doubling, capped, with jitter."""
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+    def _claim(self):
+        from app import db
+        from app.models import OutboxEmail
+
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            db.select(OutboxEmail.id, OutboxEmail.from_email, OutboxEmail.subject, OutboxEmail.message,
+                      OutboxEmail.attempts, OutboxEmail.created_at)
+            .where(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            db.session.execute(
+                db.update(OutboxEmail).where(OutboxEmail.id.in_([row.id for row in rows]))
+                .values(attempts=OutboxEmail.attempts + 1, next_attempt_at=now + timedelta(seconds=self.claim_lease))
+            )
+        db.session.commit()
+        return rows
+
+    def _recipient(self):
+        """MAIL_RECIPIENT, else the site owner's address; raises MailNotConfigured if neither is set."""
+        from app.models import SiteSettings
+
+        recipient = self.app.config['MAIL_RECIPIENT']
+        if not recipient:
+            settings = SiteSettings.query.first()
+            recipient = settings.owner_email if settings else None
+        if not recipient:
+            raise MailNotConfigured('MAIL_RECIPIENT (ADMIN_EMAIL) is not set and the site settings have no owner email')
+        return recipient
+
+    def _message(self, row, sender, recipient):
+        message = EmailMessage()
+        message['From'] = sender
+        message['To'] = recipient
+        message['Reply-To'] = row.from_email
+        message['Subject'] = row.subject
+        # Stable across retries, so a resend after a lost reply can be deduplicated.
+        message['Message-ID'] = f"<outbox-{row.id}-{int(row.created_at.timestamp())}@{sender.rpartition('@')[2]}>"
+        message['Date'] = format_datetime(row.created_at.replace(tzinfo=timezone.utc))
+        message.set_content(f'From: {row.from_email}\n\n{row.message}')
+        return message
+
+    def deliver(self, connection):
+        """Claim one batch of due messages and send it over `connection`.
+
+        Returns counts of messages claimed, sent, retried and failed.
+        """
+        from app import db
+        from app.models import OutboxEmail
+
+        counts = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        # Looked up before claiming, so a missing recipient leaves the queue untouched.
+        recipient = self._recipient()
+        rows = self._claim()
+        if not rows:
+            return counts
+        counts['claimed'] = len(rows)
+
+        sender = self.app.config['MAIL_SENDER']
+        sent = []
+        outcomes = {}
+        for index, row in enumerate(rows):
+            try:
+                connection.send(self._message(row, sender, recipient))
+            except Exception as e:
+                outcomes[row] = e
+                if not isinstance(e, smtplib.SMTPException) and isinstance(e, OSError):
+                    # The server is unreachable; the rest of the batch would
+                    # only fail the same way, one connect timeout at a time.
+                    outcomes.update((rest, e) for rest in rows[index + 1:])
+                    break
+            else:
+                sent.append(row.id)
+
+        now = datetime.utcnow()
+        if sent:
+            db.session.execute(
+                db.update(OutboxEmail).where(OutboxEmail.id.in_(sent))
+                .values(status='sent', sent_at=now, last_error=None)
+            )
+            counts['sent'] = len(sent)
+        for row, error in outcomes.items():
+            attempts = row.attempts + 1
+            values = {'last_error': f'{type(error).__name__}: {error}'[:1000]}
+            if is_permanent(error) or attempts >= self.max_attempts:
+                values['status'] = 'failed'
+                counts['failed'] += 1
+                self.app.logger.error('Giving up on email %s after %s attempt(s): %s', row.id, attempts, error)
+            else:
+                values['next_attempt_at'] = now + self.retry_after(attempts)
+                counts['retried'] += 1
+                self.app.logger.warning('Email %s failed (attempt %s), will retry: %s', row.id, attempts, error)
+            db.session.execute(db.update(OutboxEmail).where(OutboxEmail.id == row.id).values(**values))
+        db.session.commit()
+        return counts
+
+    def run(self, once=False, poll_interval=5):
+        """Deliver due messages until the queue is drained (`once`) or forever.
+
+        Returns the totals of all batches.
+        """
+        if not self.app.config['MAIL_SENDER']:
+            raise MailNotConfigured('MAIL_SENDER (FROM_EMAIL) is not set')
+        self._recipient()
+        totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        connection = SMTPConnection(self.smtp_factory)
+        try:
+            while True:
+                counts = self.deliver(connection)
+                for key, value in counts.items():
+                    totals[key] += value
+                if counts['claimed'] == self.batch_size:
+                    continue
+                if once:
+                    return totals
+                time.sleep(poll_interval)
+        finally:
+            connection.close()
+
+
+@click.command('send-emails')
+@click.option('--once', is_flag=True, help='Exit once no message is due instead of polling.')
+@click.option('--poll-interval', default=5.0, show_default=True, help='Seconds between queue checks.')
+@with_appcontext
+def send_emails_command(once, poll_interval):
+    """Deliver queued contact form email over SMTP."""
+    from app import email_outbox
+
+    try:
+        totals = email_outbox.run(once=once, poll_interval=poll_interval)
+    except MailNotConfigured as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Sent {totals['sent']}, retrying {totals['retried']}, failed {totals['failed']}.")
@@ -0,0 +1,140 @@
+"""Prometheus metrics for requests, SQL and the connection pool.
+
+Every request records its latency, response size, and the number of SQL
+statements and total database time it used, labelled by Flask endpoint.
+SQL is counted with engine events, so requests answered from the response
+cache show up with zero statements. Pool checkouts feed a wait-time
+histogram from app.pool.checkout_stats, and the pool's size and usage are
+sampled as requests finish.
+
+Needs prometheus_client. Under gunicorn set PROMETHEUS_MULTIPROC_DIR to
+an empty directory: each worker then writes its samples there and
+/metrics (in routes/health.py) reports the sum over all workers.
+gunicorn_config.py clears the directory on startup and removes a
+worker's live gauges when it exits.
+"""
+import os
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # optional; requests aren't instrumented without it
+    prometheus_client = None
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time spent handling a request.',
+        ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+    )
+    REQUESTS = Counter(
+        'http_requests_total', 'Requests handled, by status code.',
+        ['endpoint', 'method', 'status']
+    )
+    RESPONSE_SIZE = Histogram(
+        'http_response_size_bytes', 'Response body size as sent (after compression).',
+        ['endpoint'], buckets=SIZE_BUCKETS
+    )
+    REQUEST_STATEMENTS = Histogram(
+        'db_statements_per_request', 'SQL statements executed per request.',
+        ['endpoint'], buckets=STATEMENT_BUCKETS
+    )
+    REQUEST_DB_TIME = Histogram(
+        'db_time_per_request_seconds', 'Time spent in SQL statements per request.',
+        ['endpoint'], buckets=LATENCY_BUCKETS
+    )
+    POOL_CHECKOUT_WAIT = Histogram(
+        'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+        buckets=LATENCY_BUCKETS
+    )
+    POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts', 'Pool checkouts that timed out.')
+    POOL_SIZE = Gauge('db_pool_size', 'Connections the pool keeps open.', multiprocess_mode='livesum')
+    POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections in use.', multiprocess_mode='livesum')
+    POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections open beyond the pool size.', multiprocess_mode='livesum')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_started' in g:
+        g.sql_count = g.get('sql_count', 0) + 1
+        g.sql_time = g.get('sql_time', 0.0) + time.perf_counter() - g.pop('sql_started')
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+        self.token = None
+        self._listening = False
+
+    def init_app(self, app):
+        self.token = app.config.setdefault('METRICS_TOKEN', None)
+        self.enabled = app.config.setdefault('METRICS_ENABLED', True) and prometheus_client is not None
+        if not self.enabled:
+            return
+        if not self._listening:
+            # Engine-wide, so the async app's engine is counted too.
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            from app.pool import checkout_stats
+            checkout_stats.listeners.append(self._observe_checkout)
+            self._listening = True
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _observe_checkout(self, seconds, timed_out):
+        POOL_CHECKOUT_WAIT.observe(seconds)
+        if timed_out:
+            POOL_TIMEOUTS.inc()
+
+    def _start(self):
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    def _finish(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+        REQUEST_STATEMENTS.labels(endpoint).observe(g.sql_count)
+        REQUEST_DB_TIME.labels(endpoint).observe(g.sql_time)
+        self._sample_pool()
+        return response
+
+    def _sample_pool(self):
+        from app import db
+
+        pool = db.engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size())
+            POOL_CHECKED_OUT.set(pool.checkedout())
+            POOL_OVERFLOW.set(max(0, pool.overflow()))
+
+    def generate(self):
+        """The exposition body and its content type. In multiprocess mode
+        the samples of all workers are summed."""
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.REGISTRY
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
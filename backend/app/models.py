@@ -1,11 +1,11 @@
-from app import db, login_manager
+from app import db, login_manager, user_cache
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load(int(user_id))
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -37,6 +37,10 @@ class Project(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    __table_args__ = (
+        db.Index('ix_projects_active_order', is_active, display_order, id, postgresql_where=db.text('is_active')),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -89,6 +93,10 @@ class WebLink(db.Model):
     display_order = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     
+    __table_args__ = (
+        db.Index('ix_web_links_active_order', is_active, display_order, id, postgresql_where=db.text('is_active')),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -161,9 +169,39 @@ class Folder(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_folders_order', display_order, created_at.desc()),
+        db.Index('ix_folders_active_order', is_active, display_order, created_at.desc(),
+                 postgresql_where=db.text('is_active')),
+    )
+    
     design_items = db.relationship('DesignWork', backref='folder', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    @staticmethod
+    def item_counts_subquery():
+        """Subquery of (folder_id, item_count) for active design work."""
+        return db.select(DesignWork.folder_id, db.func.count(DesignWork.id).label('item_count')) \
+            .where(DesignWork.is_active == True) \
+            .group_by(DesignWork.folder_id) \
+            .subquery()
+    
+    @staticmethod
+    def query_with_item_counts():
+        """Query of (Folder, active item count) pairs.
+        
+        Counts come from one grouped subquery joined onto the folders, so
+        listings never load design_items.
+        """
+        counts = Folder.item_counts_subquery()
+        return db.session.query(Folder, db.func.coalesce(counts.c.item_count, 0)) \
+            .outerjoin(counts, counts.c.folder_id == Folder.id)
+    
+    def active_item_count(self):
+        return DesignWork.query.filter_by(folder_id=self.id, is_active=True).count()
+    
+    def to_dict(self, item_count=None):
+        if item_count is None:
+            item_count = self.active_item_count()
         return {
             'id': self.id,
             'name': self.name,
@@ -171,7 +209,7 @@ class Folder(db.Model):
             'icon_type': self.icon_type,
             'display_order': self.display_order,
             'is_active': self.is_active,
-            'item_count': len([item for item in self.design_items if item.is_active]),
+            'item_count': item_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -194,9 +232,22 @@ class DesignWork(db.Model):
     display_order = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     folder_id = db.Column(db.Integer, db.ForeignKey('folders.id'), nullable=False)
+    processing_status = db.Column(db.String(20), default='ready', server_default='ready', nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    derivatives = db.relationship('ImageDerivative', backref='design_work', lazy='selectin',
+                                  cascade='all, delete-orphan', order_by='ImageDerivative.width')
+    
+    __table_args__ = (
+        # Public folder listing and keyset pages; also serves the grouped item counts.
+        db.Index('ix_design_work_folder_active_order', folder_id, is_active, display_order,
+                 created_at.desc(), id.desc(), postgresql_where=db.text('is_active')),
+        # Admin listings, which include inactive items.
+        db.Index('ix_design_work_folder_order', folder_id, display_order, created_at.desc()),
+        db.Index('ix_design_work_order', display_order, created_at.desc()),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -214,6 +265,76 @@ class DesignWork(db.Model):
             'display_order': self.display_order,
             'is_active': self.is_active,
             'folder_id': self.folder_id,
+            'processing_status': self.processing_status,
+            'srcset': self.srcset(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+    
+    def srcset(self):
+        """Map format -> srcset string, e.g. {'webp': '/a_w320.webp 320w, ...'}."""
+        candidates = {}
+        for derivative in self.derivatives:
+            candidates.setdefault(derivative.format, []).append(f'{derivative.url} {derivative.width}w')
+        return {fmt: ', '.join(urls) for fmt, urls in candidates.items()}
+
+class Blob(db.Model):
+    """An uploaded file, stored once under its content hash."""
+    __tablename__ = 'blobs'
+    
+    hash = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(80), unique=True, nullable=False)
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ImageDerivative(db.Model):
+    __tablename__ = 'image_derivatives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    design_work_id = db.Column(db.Integer, db.ForeignKey('design_work.id', ondelete='CASCADE'), nullable=False, index=True)
+    format = db.Column(db.String(10), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    file_size = db.Column(db.Integer)
+    url = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'design_work_id': self.design_work_id,
+            'format': self.format,
+            'width': self.width,
+            'height': self.height,
+            'file_size': self.file_size,
+            'url': self.url
+        }
+
+class OutboxEmail(db.Model):
+    """A contact form message waiting for (or done with) SMTP delivery."""
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    from_email = db.Column(db.String(254), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', server_default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', status, next_attempt_at,
+                 postgresql_where=db.text("status = 'pending'")),
+    )
+
+class VersionStamp(db.Model):
+    """A change counter for cached data, shared by every worker and host."""
+    __tablename__ = 'version_stamps'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,103 @@
+"""Batch reordering of folders, projects, links and design work.
+
+display_order values are kept sparse, ORDER_GAP apart, so moving one item
+usually rewrites only that row: it takes a key halfway between its new
+neighbours. Only when the neighbours' keys are adjacent (or tied, as in
+collections created before this, where many rows share 0) is the whole
+collection renumbered, and then by a single CASE UPDATE of the rows whose
+key changes.
+
+Collections are read in their listing order (display_order, then the
+listing's tie-breakers) with their rows locked, so concurrent reorders of
+the same collection on Postgres apply one after the other.
+"""
+from app import db
+
+ORDER_GAP = 1024
+# Rows per UPDATE when renumbering, to stay under SQLite's bound parameter limit.
+UPDATE_BATCH = 1000
+
+
+def next_order(model, *criteria):
+    """The display_order for an item appended to the collection."""
+    last = db.session.scalar(db.select(db.func.max(model.display_order)).where(*criteria))
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+
+def _ordered(model, criteria, tie_breakers):
+    """(id, display_order) of the collection, in listing order."""
+    statement = db.select(model.id, model.display_order).where(*criteria) \
+        .order_by(model.display_order, *tie_breakers).with_for_update()
+    return [(row.id, row.display_order or 0) for row in db.session.execute(statement)]
+
+
+def _update(model, keys):
+    """Set display_order from `keys` ({id: key}) with one CASE UPDATE per batch."""
+    ids = list(keys)
+    for start in range(0, len(ids), UPDATE_BATCH):
+        batch = {item_id: keys[item_id] for item_id in ids[start:start + UPDATE_BATCH]}
+        db.session.execute(
+            db.update(model).where(model.id.in_(batch))
+            .values(display_order=db.case(batch, value=model.id)),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def _renumber(model, current, ids):
+    """Give `ids` evenly spaced keys in order; returns the keys that changed."""
+    changed = {}
+    for index, item_id in enumerate(ids):
+        key = (index + 1) * ORDER_GAP
+        if current[item_id] != key:
+            changed[item_id] = key
+    _update(model, changed)
+    return changed
+
+
+def reorder(model, ids, criteria=(), tie_breakers=()):
+    """Put the collection in the order of `ids`, which must list each of
+    its items once. Returns {id: display_order} for the rows that changed.
+    """
+    rows = _ordered(model, criteria, tie_breakers)
+    current = dict(rows)
+    if len(ids) != len(current) or set(ids) != set(current):
+        raise ValueError('ids must list every item in the collection exactly once')
+    return _renumber(model, current, ids)
+
+
+def move(model, item_id, anchor, place='after', criteria=(), tie_breakers=()):
+    """Move `item_id` directly after (or, with place='before', before)
+    `anchor`. A None anchor means the start for 'after' and the end for
+    'before'. Returns {id: display_order} for the rows that changed,
+    usually just the moved one.
+    """
+    rows = _ordered(model, criteria, tie_breakers)
+    current = dict(rows)
+    if item_id not in current:
+        raise LookupError(item_id)
+    if anchor is not None and (anchor not in current or anchor == item_id):
+        raise ValueError('the item to move next to must be another item in the collection')
+
+    ids = [row_id for row_id, _ in rows if row_id != item_id]
+    if anchor is None:
+        index = 0 if place == 'after' else len(ids)
+    else:
+        index = ids.index(anchor) + (place == 'after')
+    ids.insert(index, item_id)
+
+    previous = current[ids[index - 1]] if index > 0 else None
+    following = current[ids[index + 1]] if index + 1 < len(ids) else None
+    if previous is None and following is None:
+        return {}
+    if previous is None:
+        key = following - ORDER_GAP
+    elif following is None:
+        key = previous + ORDER_GAP
+    elif following - previous >= 2:
+        key = (previous + following) // 2
+    else:
+        return _renumber(model, current, ids)
+    if key == current[item_id]:
+        return {}
+    _update(model, {item_id: key})
+    return {item_id: key}
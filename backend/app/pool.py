@@ -0,0 +1,147 @@
+"""Database connection pool settings and checkout timing.
+
+Pool sizes default from the gunicorn threads-per-worker count: every
+request thread can hold one connection, with the same number again as
+overflow for bursts and background callbacks (image processing results).
+With `preload_app` the master builds the engine before forking, so the
+post_fork hook in gunicorn_config.py calls `dispose_engines` to give each
+worker its own pool instead of sockets inherited from the master.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutStats:
+    """Running totals for pool checkout wait times in this process."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.timeouts = 0
+        self.slow_threshold = 0.1
+        # Called with (seconds, timed_out) for every checkout, e.g. by app.metrics.
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            if timed_out:
+                self.timeouts += 1
+        for listener in self.listeners:
+            listener(seconds, timed_out)
+        if seconds >= self.slow_threshold:
+            logger.warning('Waited %.3fs for a database connection%s', seconds, ' (timed out)' if timed_out else '')
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.count,
+                'wait_seconds_total': self.total,
+                'wait_seconds_max': self.max,
+                'timeouts': self.timeouts,
+            }
+
+
+checkout_stats = CheckoutStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            checkout_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        checkout_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for asyncio engines (the ASGI app)."""
+
+
+def engine_options(database_uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_uri`, tunable through DB_POOL_* variables.
+
+    SQLite keeps SQLAlchemy's defaults; its pools don't take these options.
+    """
+    if not database_uri or database_uri.startswith('sqlite'):
+        return {}
+    threads = int(environ.get('GUNICORN_THREADS', 2))
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(environ.get('DB_POOL_SIZE', threads)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', threads)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
+
+def dispose_engines(app):
+    """Drop pooled connections inherited across fork without closing them.
+
+    close=False leaves the parent's sockets alone (closing them here would
+    break the master's connections); the worker just stops using them.
+    """
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+# Async drivers for the synchronous URLs DATABASE_URL usually holds.
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(database_uri):
+    """`database_uri` with its driver swapped for the asyncio one.
+
+    asyncpg takes `ssl` where libpq takes `sslmode`, so that is renamed.
+    """
+    url = make_url(database_uri)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    if url.drivername == 'postgresql+asyncpg' and 'sslmode' in url.query:
+        query = dict(url.query)
+        query['ssl'] = query.pop('sslmode')
+        url = url.set(query=query)
+    return url
+
+
+def async_engine_options(database_uri, environ=os.environ):
+    """Engine options for the ASGI app's async engine.
+
+    One event loop serves many concurrent requests, so the pool isn't tied
+    to a thread count; ASYNC_DB_POOL_SIZE/ASYNC_DB_MAX_OVERFLOW size it and
+    the remaining DB_POOL_* settings apply as for the sync engine.
+    """
+    options = engine_options(database_uri, environ)
+    if not options:
+        return options
+    options.update({
+        'poolclass': TimedAsyncQueuePool,
+        'pool_size': int(environ.get('ASYNC_DB_POOL_SIZE', 10)),
+        'max_overflow': int(environ.get('ASYNC_DB_MAX_OVERFLOW', 10)),
+    })
+    return options
@@ -0,0 +1,122 @@
+"""EXPLAIN-based check that the API listing queries are served from indexes.
+
+Each entry in `listing_queries()` mirrors a listing query in
+app/routes/api.py or app/routes/admin.py; keep them in step when a query
+shape changes. Run it with `flask --app wsgi check-query-plans` against a
+seeded database.
+"""
+import json
+import re
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from app import db
+from app.models import Project, WebLink, Folder, DesignWork
+
+LISTING_TABLES = {'projects', 'web_links', 'folders', 'design_work'}
+
+_SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def listing_queries(folder_id=1):
+    """(name, query) pairs for every listing query shape the API runs."""
+    item_order = (DesignWork.display_order, DesignWork.created_at.desc())
+    public_items = DesignWork.query.filter_by(folder_id=folder_id, is_active=True) \
+        .order_by(*item_order, DesignWork.id.desc())
+    cursor = (0, datetime(2000, 1, 1), 0)
+    return [
+        ('api.get_projects',
+         Project.query.filter_by(is_active=True).order_by(Project.display_order, Project.id)),
+        ('api.get_links',
+         WebLink.query.filter_by(is_active=True).order_by(WebLink.display_order, WebLink.id)),
+        ('api.get_public_folders',
+         Folder.query_with_item_counts().filter(Folder.is_active == True)
+         .order_by(Folder.display_order, Folder.created_at.desc())),
+        ('api.get_folder_work',
+         public_items.limit(61)),
+        ('api.get_folder_work (next page)',
+         public_items.filter(db.or_(
+             DesignWork.display_order > cursor[0],
+             db.and_(DesignWork.display_order == cursor[0], db.or_(
+                 DesignWork.created_at < cursor[1],
+                 db.and_(DesignWork.created_at == cursor[1], DesignWork.id < cursor[2])
+             ))
+         )).limit(61)),
+        ('api.get_folder_work (all=1)',
+         public_items),
+        ('api.get_folder_items / admin.get_design_work?folder_id=',
+         DesignWork.query.filter_by(folder_id=folder_id).order_by(*item_order)),
+        ('admin.get_design_work',
+         DesignWork.query.order_by(*item_order)),
+        ('admin.get_folders',
+         Folder.query_with_item_counts().order_by(Folder.display_order, Folder.created_at.desc())),
+    ]
+
+
+def _literal_sql(connection, statement):
+    return str(statement.compile(connection, compile_kwargs={'literal_binds': True}))
+
+
+def _sqlite_scans(connection, statement):
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + _literal_sql(connection, statement)).all()
+    scans = []
+    for row in rows:
+        match = _SQLITE_FULL_SCAN.match(row[-1])
+        if match and match.group(1) in LISTING_TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def _postgres_scans(connection, statement):
+    sql = _literal_sql(connection, statement)
+    # With sequential scans disabled the planner still picks one only when
+    # no index can serve the query, which makes the check independent of
+    # table sizes and statistics.
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in LISTING_TABLES:
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def sequential_scans(folder_id=1):
+    """Return {query name: [tables scanned sequentially]} for offending queries."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        explain = _postgres_scans
+    elif dialect == 'sqlite':
+        explain = _sqlite_scans
+    else:
+        raise RuntimeError(f'No query plan check for {dialect} databases')
+
+    offenders = {}
+    for name, query in listing_queries(folder_id):
+        with db.engine.connect() as connection:
+            with connection.begin():
+                scans = explain(connection, query.statement)
+        if scans:
+            offenders[name] = scans
+    return offenders
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Fail if any API listing query falls back to a sequential scan."""
+    folder = Folder.query.first()
+    offenders = sequential_scans(folder.id if folder else 1)
+    if offenders:
+        for name, tables in offenders.items():
+            click.echo(f'SEQ SCAN  {name}: {", ".join(tables)}')
+        raise SystemExit(1)
+    click.echo('All listing queries use an index.')
@@ -0,0 +1,198 @@
+"""Opt-in SQL profiling: N+1 and slow-query detection.
+
+With QUERY_PROFILER on, every SQL statement a request runs is recorded
+with its duration and the app code that issued it. Statements are grouped
+by shape (whitespace and IN-list lengths normalized), and the request is
+flagged when
+
+- one shape runs QUERY_REPEAT_LIMIT times or more (the N+1 pattern),
+- a single statement takes SLOW_QUERY_MS or longer, or
+- the request exceeds QUERY_BUDGET_COUNT statements or QUERY_BUDGET_MS
+  of total SQL time.
+
+Every profiled response carries `Server-Timing: db;dur=...` (shown in the
+browser's network panel). Flagged responses also get an X-Query-Report
+header, and a warning is logged naming each offending statement and the
+app frames that issued it.
+
+`assert_queries` applies the same checks to any block of code, so tests
+can pin an endpoint's query budget:
+
+    with assert_queries(max_count=2, max_repeats=1):
+        client.get('/api/folders')
+"""
+import contextvars
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+# App frames kept per statement, innermost first.
+ORIGIN_DEPTH = 3
+
+Query = namedtuple('Query', 'statement shape duration origin')
+
+_recorders = contextvars.ContextVar('query_recorders', default=())
+_listening = False
+
+
+def statement_shape(statement):
+    """`statement` with whitespace collapsed and IN lists of any length
+    reduced to one placeholder."""
+    shape = ' '.join(statement.split())
+    return re.sub(r'\((?:\?|%\(\w+\)s|%s|:\w+)(?:, (?:\?|%\(\w+\)s|%s|:\w+))*\)', '(?)', shape)
+
+
+def _origin():
+    """The innermost app frames on the stack, outside this module."""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < ORIGIN_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and filename != __file__:
+            path = os.path.relpath(filename, os.path.dirname(APP_ROOT))
+            frames.append(f'{path}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' < '.join(frames) or None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _recorders.get():
+        conn.info.setdefault('query_profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorders = _recorders.get()
+    started = conn.info.get('query_profiler_started')
+    if not recorders or not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    if any(recorder.trace for recorder in recorders):
+        query = Query(statement, statement_shape(statement), duration, _origin())
+    else:
+        query = Query(statement, statement, duration, None)
+    for recorder in recorders:
+        recorder.queries.append(query)
+
+
+def _listen():
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+class QueryRecorder:
+    """Records the SQL run in this context (thread or task) while entered.
+
+    Recorders nest; each one sees every statement run inside it. Without
+    `trace` statements aren't normalized and their origin isn't looked up,
+    which keeps the overhead low enough for timing.
+    """
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.queries = []
+        self._token = None
+
+    def __enter__(self):
+        _listen()
+        self._token = _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recorders.reset(self._token)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    def problems(self, max_count=None, max_duration=None, max_repeats=None, slow=None):
+        """Descriptions of everything over the given limits (durations in seconds)."""
+        problems = []
+        if max_count is not None and self.count > max_count:
+            problems.append(f'{self.count} statements, over the budget of {max_count}')
+        if max_duration is not None and self.duration > max_duration:
+            problems.append(f'{self.duration * 1000:.1f}ms of SQL, over the budget of {max_duration * 1000:.0f}ms')
+        if max_repeats is not None:
+            shapes = {}
+            for query in self.queries:
+                shapes.setdefault(query.shape, []).append(query)
+            for shape, queries in shapes.items():
+                if len(queries) > max_repeats:
+                    problems.append(f'{len(queries)}x {shape} [{queries[0].origin}]')
+        if slow is not None:
+            for query in self.queries:
+                if query.duration >= slow:
+                    problems.append(f'slow ({query.duration * 1000:.1f}ms) {query.shape} [{query.origin}]')
+        return problems
+
+
+@contextmanager
+def assert_queries(max_count=None, max_repeats=None, max_duration=None):
+    """Fail with AssertionError if the block runs more SQL than allowed.
+
+    `max_repeats` is the most times one statement shape may run;
+    `max_duration` is in seconds.
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = recorder.problems(max_count, max_duration, max_repeats)
+    if problems:
+        raise AssertionError('Query budget exceeded:\n  ' + '\n  '.join(problems))
+
+
+class QueryProfiler:
+
+    def __init__(self):
+        self.enabled = False
+        self.max_count = 20
+        self.max_duration = 0.2
+        self.repeat_limit = 5
+        self.slow = 0.1
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('QUERY_PROFILER', False)
+        self.max_count = app.config.setdefault('QUERY_BUDGET_COUNT', 20)
+        self.max_duration = app.config.setdefault('QUERY_BUDGET_MS', 200) / 1000
+        self.repeat_limit = app.config.setdefault('QUERY_REPEAT_LIMIT', 5)
+        self.slow = app.config.setdefault('SLOW_QUERY_MS', 100) / 1000
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._report)
+        app.teardown_request(self._stop)
+
+    def _start(self):
+        g.query_recorder = QueryRecorder().__enter__()
+
+    def _stop(self, exc):
+        recorder = g.pop('query_recorder', None)
+        if recorder is not None:
+            recorder.__exit__(None, None, None)
+
+    def _report(self, response):
+        recorder = g.get('query_recorder')
+        if recorder is None:
+            return response
+        response.headers.add('Server-Timing', f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"')
+        problems = recorder.problems(self.max_count, self.max_duration, self.repeat_limit - 1, self.slow)
+        if problems:
+            response.headers['X-Query-Report'] = f'{len(problems)} problem(s), {recorder.count} queries'
+            current_app.logger.warning(
+                'Query problems in %s %s (%s):\n  %s',
+                request.method, request.path, request.endpoint, '\n  '.join(problems)
+            )
+        return response
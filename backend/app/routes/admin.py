@@ -1,19 +1,56 @@
-from flask import Blueprint, jsonify, request, render_template, redirect, url_for, current_app, send_from_directory
+from flask import Blueprint, jsonify, request, render_template, redirect, url_for, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db
+from app import db, image_worker, blob_storage, file_delivery, response_compressor, login_guard, serializers, ordering
+from app.auth import VerifierBusy
 from app.models import User, Project, ResumeInfo, WebLink, SiteSettings, Folder, DesignWork
 from werkzeug.utils import secure_filename
-from PIL import Image
-import os
-import uuid
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
+bp.after_request(response_compressor.compress)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _reorder(model, criteria=(), tie_breakers=()):
+    """Apply a reorder request to one collection in one transaction.
+    
+    The body is either {"ids": [...]}, the collection's ids in their new
+    order, or {"move": id, "after": id} / {"move": id, "before": id} to
+    move one item; "after": null moves it to the start and "before": null
+    to the end. Responds with the new display_order of each changed row.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid JSON payload'}), 400
+    
+    def is_id(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+    
+    try:
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or not all(is_id(i) for i in ids):
+                return jsonify({'error': 'ids must be a list of integers'}), 400
+            changed = ordering.reorder(model, ids, criteria, tie_breakers)
+        elif 'move' in data:
+            places = [place for place in ('after', 'before') if place in data]
+            if not is_id(data['move']) or len(places) != 1 or not (data[places[0]] is None or is_id(data[places[0]])):
+                return jsonify({'error': 'move needs an item id and exactly one of after or before'}), 400
+            changed = ordering.move(model, data['move'], data[places[0]], places[0], criteria, tie_breakers)
+        else:
+            return jsonify({'error': 'ids or move is required'}), 400
+    except LookupError:
+        db.session.rollback()
+        return jsonify({'error': 'Item not found'}), 404
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    db.session.commit()
+    return jsonify({'updated': [{'id': item_id, 'display_order': key} for item_id, key in changed.items()]})
+
 @bp.route('/login', methods=['GET'])
 def login_page():
     return render_template('admin/login.html')
@@ -33,10 +70,27 @@ def login():
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'message': 'Invalid credentials'}), 401
+    
+    # Throttled before the user lookup, so rejected attempts cost no query or hash.
+    wait = login_guard.throttle(request.remote_addr or '', username)
+    if wait:
+        response = jsonify({'message': 'Too many login attempts. Try again later.'})
+        response.headers['Retry-After'] = str(wait)
+        return response, 429
     
     user = User.query.filter_by(username=username).first()
     
-    if user and user.check_password(password):
+    try:
+        valid = user is not None and login_guard.verify(user.password_hash, password)
+    except VerifierBusy:
+        response = jsonify({'message': 'Login is busy. Try again in a moment.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    if valid:
+        login_guard.succeeded(username)
         login_user(user)
         return jsonify({'message': 'Logged in successfully', 'user': {'username': user.username, 'email': user.email}}), 200
     
@@ -60,7 +114,7 @@ def create_project():
         github_url=data.get('github_url'),
         live_url=data.get('live_url'),
         image_url=data.get('image_url'),
-        display_order=data.get('display_order', 0),
+        display_order=data['display_order'] if 'display_order' in data else ordering.next_order(Project),
         is_active=data.get('is_active', True)
     )
     
@@ -88,6 +142,11 @@ def update_project(project_id):
     
     return jsonify(project.to_dict())
 
+@bp.route('/projects/reorder', methods=['POST'])
+@login_required
+def reorder_projects():
+    return _reorder(Project, tie_breakers=(Project.id,))
+
 @bp.route('/projects/<int:project_id>', methods=['DELETE'])
 @login_required
 def delete_project(project_id):
@@ -129,7 +188,7 @@ def create_link():
         title=data.get('title'),
         url=data.get('url'),
         icon=data.get('icon'),
-        display_order=data.get('display_order', 0),
+        display_order=data['display_order'] if 'display_order' in data else ordering.next_order(WebLink),
         is_active=data.get('is_active', True)
     )
     
@@ -154,6 +213,11 @@ def update_link(link_id):
     
     return jsonify(link.to_dict())
 
+@bp.route('/links/reorder', methods=['POST'])
+@login_required
+def reorder_links():
+    return _reorder(WebLink, tie_breakers=(WebLink.id,))
+
 @bp.route('/links/<int:link_id>', methods=['DELETE'])
 @login_required
 def delete_link(link_id):
@@ -215,19 +279,18 @@ def upload_image():
         return jsonify({'error': 'No selected file'}), 400
     
     if file and allowed_file(file.filename):
+        if blob_storage.image_info(file) is None:
+            return jsonify({'error': 'File content is not a supported image'}), 400
+        
         filename = secure_filename(file.filename)
         ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{ext}"
-        
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
         
-        filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
+        blob = blob_storage.store(file, ext)
+        db.session.commit()
         
         return jsonify({
-            'filename': unique_filename,
-            'url': f'/admin/uploads/{unique_filename}'
+            'filename': blob.filename,
+            'url': blob_storage.url_for(blob)
         }), 200
     
     return jsonify({'error': 'File type not allowed'}), 400
@@ -244,37 +307,32 @@ def update_profile_image():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
+    if image_slot not in ('1', '2', '3', '4'):
+        return jsonify({'error': 'slot must be 1-4'}), 400
+    
     if file and allowed_file(file.filename):
+        if blob_storage.image_info(file) is None:
+            return jsonify({'error': 'File content is not a supported image'}), 400
+        
         filename = secure_filename(file.filename)
         ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"profile_{image_slot}_{uuid.uuid4().hex}.{ext}"
-        
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
         
-        filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
+        blob = blob_storage.store(file, ext)
         
         settings = SiteSettings.query.first()
         if not settings:
             settings = SiteSettings()
             db.session.add(settings)
         
-        image_url = f'/admin/uploads/{unique_filename}'
-        
-        if image_slot == '1':
-            settings.profile_image_1 = image_url
-        elif image_slot == '2':
-            settings.profile_image_2 = image_url
-        elif image_slot == '3':
-            settings.profile_image_3 = image_url
-        elif image_slot == '4':
-            settings.profile_image_4 = image_url
+        field = f'profile_image_{image_slot}'
+        image_url = blob_storage.url_for(blob)
+        blob_storage.release(getattr(settings, field))
+        setattr(settings, field, image_url)
         
         db.session.commit()
         
         return jsonify({
-            'filename': unique_filename,
+            'filename': blob.filename,
             'url': image_url,
             'slot': image_slot
         }), 200
@@ -283,7 +341,14 @@ def update_profile_image():
 
 @bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    response = file_delivery.send('uploads', current_app.config['UPLOAD_FOLDER'], filename)
+    if blob_storage.is_immutable(filename):
+        # The name changes whenever the content does.
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
 
 @bp.route('/settings-dashboard')
 @login_required
@@ -293,8 +358,9 @@ def settings_dashboard():
 @bp.route('/folders', methods=['GET'])
 @login_required
 def get_folders():
-    folders = Folder.query.order_by(Folder.display_order, Folder.created_at.desc()).all()
-    return jsonify([folder.to_dict() for folder in folders])
+    return jsonify(serializers.folder_dicts(
+        serializers.select_folders_with_counts().order_by(Folder.display_order, Folder.created_at.desc())
+    ))
 
 @bp.route('/folders', methods=['POST'])
 @login_required
@@ -311,14 +377,14 @@ def create_folder():
         name=data.get('name'),
         description=data.get('description'),
         icon_type=data.get('icon_type', 'folder'),
-        display_order=data.get('display_order', 0),
+        display_order=data['display_order'] if 'display_order' in data else ordering.next_order(Folder),
         is_active=data.get('is_active', True)
     )
     
     db.session.add(folder)
     db.session.commit()
     
-    return jsonify(folder.to_dict()), 201
+    return jsonify(folder.to_dict(item_count=0)), 201
 
 @bp.route('/folders/<int:folder_id>', methods=['PUT'])
 @login_required
@@ -339,6 +405,11 @@ def update_folder(folder_id):
     
     return jsonify(folder.to_dict())
 
+@bp.route('/folders/reorder', methods=['POST'])
+@login_required
+def reorder_folders():
+    return _reorder(Folder, tie_breakers=(Folder.created_at.desc(), Folder.id))
+
 @bp.route('/folders/<int:folder_id>', methods=['DELETE'])
 @login_required
 def delete_folder(folder_id):
@@ -353,12 +424,11 @@ def delete_folder(folder_id):
 def get_design_work():
     folder_id = request.args.get('folder_id', type=int)
     
+    query = serializers.select_design_work().order_by(DesignWork.display_order, DesignWork.created_at.desc())
     if folder_id:
-        items = DesignWork.query.filter_by(folder_id=folder_id).order_by(DesignWork.display_order, DesignWork.created_at.desc()).all()
-    else:
-        items = DesignWork.query.order_by(DesignWork.display_order, DesignWork.created_at.desc()).all()
+        query = query.where(DesignWork.folder_id == folder_id)
     
-    return jsonify([item.to_dict() for item in items])
+    return jsonify(serializers.design_work_dicts(query))
 
 @bp.route('/design-work', methods=['POST'])
 @login_required
@@ -372,7 +442,7 @@ def create_design_work():
     description = request.form.get('description', '')
     client_name = request.form.get('client_name', '')
     tags = request.form.get('tags', '')
-    display_order = request.form.get('display_order', 0, type=int)
+    display_order = request.form.get('display_order', type=int)
     project_date = request.form.get('project_date')
     is_active = request.form.get('is_active', 'true').lower() == 'true'
     
@@ -391,34 +461,22 @@ def create_design_work():
     if not title:
         return jsonify({'error': 'title is required'}), 400
     
+    # Without an explicit position, new items go to the end of the folder.
+    if display_order is None:
+        display_order = ordering.next_order(DesignWork, DesignWork.folder_id == folder_id_int)
+    
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
     if file and allowed_file(file.filename):
+        image_info = blob_storage.image_info(file)
+        if image_info is None:
+            return jsonify({'error': 'File content is not a supported image'}), 400
+        
         filename = secure_filename(file.filename)
         ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"design_{uuid.uuid4().hex}.{ext}"
-        
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
-        
-        file_size = os.path.getsize(filepath)
-        width, height = None, None
-        
-        try:
-            with Image.open(filepath) as img:
-                width, height = img.size
-                
-                thumbnail_filename = f"thumb_{unique_filename}"
-                thumbnail_path = os.path.join(upload_folder, thumbnail_filename)
-                img.thumbnail((200, 200))
-                img.save(thumbnail_path)
-                thumbnail_url = f'/admin/uploads/{thumbnail_filename}'
-        except Exception as e:
-            thumbnail_url = None
+        blob = blob_storage.store(file, ext)
+        width, height = image_info
         
         from datetime import datetime as dt
         parsed_date = None
@@ -431,12 +489,12 @@ def create_design_work():
         design_work = DesignWork(
             title=title,
             description=description,
-            file_url=f'/admin/uploads/{unique_filename}',
-            thumbnail_url=thumbnail_url,
+            file_url=blob_storage.url_for(blob),
             file_type=ext,
-            file_size=file_size,
+            file_size=blob.size,
             width=width,
             height=height,
+            processing_status='pending',
             client_name=client_name,
             project_date=parsed_date,
             tags=tags,
@@ -448,10 +506,29 @@ def create_design_work():
         db.session.add(design_work)
         db.session.commit()
         
+        # Measuring and thumbnailing happen off the request thread.
+        image_worker.submit(design_work)
+        
         return jsonify(design_work.to_dict()), 201
     
     return jsonify({'error': 'File type not allowed'}), 400
 
+@bp.route('/design-work/status', methods=['GET'])
+@login_required
+def get_design_work_status():
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+    if not ids:
+        return jsonify({'error': 'ids is required'}), 400
+    
+    items = DesignWork.query.filter(DesignWork.id.in_(ids)).all()
+    return jsonify([{
+        'id': item.id,
+        'processing_status': item.processing_status,
+        'thumbnail_url': item.thumbnail_url,
+        'width': item.width,
+        'height': item.height
+    } for item in items])
+
 @bp.route('/design-work/<int:work_id>', methods=['PUT'])
 @login_required
 def update_design_work(work_id):
@@ -495,6 +572,13 @@ def update_design_work(work_id):
     
     return jsonify(work.to_dict())
 
+@bp.route('/folders/<int:folder_id>/design-work/reorder', methods=['POST'])
+@login_required
+def reorder_design_work(folder_id):
+    Folder.query.get_or_404(folder_id)
+    return _reorder(DesignWork, (DesignWork.folder_id == folder_id,),
+                    (DesignWork.created_at.desc(), DesignWork.id.desc()))
+
 @bp.route('/design-work/<int:work_id>', methods=['DELETE'])
 @login_required
 def delete_design_work(work_id):
@@ -1,22 +1,110 @@
-from flask import Blueprint, jsonify, request
-from app import db
+from flask import Blueprint, jsonify, request, make_response, current_app
+from app import db, content_version, response_cache, response_compressor, image_worker, blob_storage, email_outbox
+from app.cache import version_etag, version_last_modified
 from app.models import Project, ResumeInfo, WebLink, SiteSettings, Folder, DesignWork
+from app import serializers
+from app.mail import MailNotConfigured
+from app.ordering import ORDER_GAP, next_order
 from flask_login import login_required
+from email_validator import validate_email, EmailNotValidError
 from datetime import datetime
+from functools import wraps
+import base64
+import json
 
 bp = Blueprint('api', __name__, url_prefix='/api')
+bp.after_request(response_compressor.compress)
+
+class CachedLookup:
+    """Cache and validator handling for one request to a public GET endpoint.
+
+    Shared by `cached_response` and the ASGI app (app/asgi.py), which
+    renders the same endpoints with an async session.
+    """
+    
+    def __init__(self, kwargs, stamp=None):
+        # `stamp` is content_version.stamp(), when the caller already has it.
+        self.version, updated_at = stamp or content_version.stamp()
+        self.last_modified = version_last_modified(updated_at)
+        self.etag = version_etag(self.version)
+        self.key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+        self.variants = None
+    
+    def response(self):
+        """A 304 or the cached response, or None if the view has to render."""
+        if request.if_none_match:
+            not_modified = any(request.if_none_match.contains(tag) for tag in response_compressor.etags(self.etag))
+        else:
+            # None while the last change's second hasn't passed yet; see version_last_modified.
+            not_modified = (self.last_modified is not None and request.if_modified_since is not None
+                            and self.last_modified <= request.if_modified_since)
+        if not_modified:
+            return current_app.response_class(status=304)
+        
+        cached = response_cache.get(self.key, self.version)
+        if cached is None:
+            return None
+        self.variants, mimetype = cached
+        return current_app.response_class(self.variants[None], mimetype=mimetype)
+    
+    def store(self, response):
+        if response.status_code == 200:
+            self.variants = {None: response.get_data()}
+            response_cache.set(self.key, self.version, (self.variants, response.mimetype))
+        return response
+    
+    def finish(self, response):
+        if response.status_code in (200, 304):
+            response.set_etag(self.etag)
+            # Assigning None would send the current time instead.
+            if self.last_modified is not None:
+                response.last_modified = self.last_modified
+            response.headers['Cache-Control'] = current_app.config['API_CACHE_CONTROL']
+        return response_compressor.compress(response, self.variants)
+
+def cached_response(view):
+    """Serve a public GET endpoint from the response cache.
+
+    Entries are keyed by endpoint and arguments; admin writes bump the
+    content version, which invalidates them. The same version doubles as
+    the ETag/Last-Modified validator, so conditional requests get a 304
+    before anything is queried or serialized. Compressed bodies are kept
+    in the cache entry alongside the plain one.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        lookup = CachedLookup(kwargs)
+        response = lookup.response()
+        if response is None:
+            response = lookup.store(make_response(view(*args, **kwargs)))
+        return lookup.finish(response)
+    return wrapper
+
+def _active_projects(session=None):
+    return serializers.project_dicts(
+        serializers.select_projects().where(Project.is_active == True).order_by(Project.display_order, Project.id),
+        session
+    )
+
+def _active_links(session=None):
+    return serializers.web_link_dicts(
+        serializers.select_web_links().where(WebLink.is_active == True).order_by(WebLink.display_order, WebLink.id),
+        session
+    )
 
 @bp.route('/projects', methods=['GET'])
+@cached_response
 def get_projects():
-    projects = Project.query.filter_by(is_active=True).order_by(Project.display_order).all()
-    return jsonify([p.to_dict() for p in projects])
+    return jsonify(_active_projects())
 
 @bp.route('/projects/<int:project_id>', methods=['GET'])
+@cached_response
 def get_project(project_id):
     project = Project.query.get_or_404(project_id)
     return jsonify(project.to_dict())
 
 @bp.route('/resume', methods=['GET'])
+@cached_response
 def get_resume():
     resume = ResumeInfo.query.first()
     if resume:
@@ -24,12 +112,20 @@ def get_resume():
     return jsonify({'message': 'Resume info not found'}), 404
 
 @bp.route('/links', methods=['GET'])
+@cached_response
 def get_links():
-    links = WebLink.query.filter_by(is_active=True).order_by(WebLink.display_order).all()
-    return jsonify([link.to_dict() for link in links])
+    return jsonify(_active_links())
 
 @bp.route('/send-email', methods=['POST'])
 def send_email():
+    """Queue a contact form message; `flask send-emails` delivers it."""
+    # Throttled per client address before anything is validated or stored.
+    wait = email_outbox.throttle(request.remote_addr or '')
+    if wait:
+        response = jsonify({'message': 'Too many messages. Try again later.'})
+        response.headers['Retry-After'] = str(wait)
+        return response, 429
+    
     data = request.get_json()
     
     from_email = data.get('from')
@@ -39,14 +135,25 @@ def send_email():
     if not all([from_email, subject, message]):
         return jsonify({'message': 'Missing required fields'}), 400
     
-    return jsonify({'message': 'Email sent successfully'}), 200
+    try:
+        from_email = validate_email(from_email, check_deliverability=False).normalized
+    except EmailNotValidError:
+        return jsonify({'message': 'Invalid email address'}), 400
+    if len(subject) > 200 or '\r' in subject or '\n' in subject:
+        return jsonify({'message': 'Invalid subject'}), 400
+    
+    try:
+        email_outbox.enqueue(from_email, subject, message)
+    except MailNotConfigured:
+        current_app.logger.error('Contact form message refused: no recipient is configured')
+        return jsonify({'message': 'Email is not configured'}), 503
+    return jsonify({'message': 'Email queued for delivery'}), 202
 
-@bp.route('/site-settings', methods=['GET'])
-def get_site_settings():
-    settings = SiteSettings.query.first()
+def _site_settings_dict(session=None):
+    settings = (session or db.session).scalars(db.select(SiteSettings).limit(1)).first()
     if settings:
-        return jsonify(settings.to_dict())
-    return jsonify({
+        return settings.to_dict()
+    return {
         'pc_name': "Sujay K's PC",
         'welcome_title': "Welcome To Sujay K's Personal Website",
         'browser_tab_title': "Sujay K's Personal Website - Home Page",
@@ -66,14 +173,84 @@ def get_site_settings():
         'boot_screen_line1': "Sujay's",
         'boot_screen_line2': "Portfolio",
         'boot_screen_copyright': "Copyright © Sujay K"
-    })
+    }
+
+def _active_folders(session=None):
+    return serializers.folder_dicts(
+        serializers.select_folders_with_counts().where(Folder.is_active == True)
+        .order_by(Folder.display_order, Folder.created_at.desc()),
+        session
+    )
+
+def _encode_cursor(item):
+    key = [item['display_order'], item['created_at'], item['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        display_order, created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(display_order), datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+def _active_folder_items(folder_id, limit=None, cursor=None, session=None):
+    """Active items of a folder, in display order.
+    
+    With a limit, returns one keyset page: items strictly after `cursor`
+    in (display_order, created_at desc, id desc) order, plus the cursor for
+    the next page (None on the last page).
+    """
+    query = serializers.select_design_work() \
+        .where(DesignWork.folder_id == folder_id, DesignWork.is_active == True) \
+        .order_by(DesignWork.display_order, DesignWork.created_at.desc(), DesignWork.id.desc())
+    if limit is None:
+        return serializers.design_work_dicts(query, session)
+    
+    if cursor is not None:
+        display_order, created_at, item_id = cursor
+        query = query.where(db.or_(
+            DesignWork.display_order > display_order,
+            db.and_(DesignWork.display_order == display_order, db.or_(
+                DesignWork.created_at < created_at,
+                db.and_(DesignWork.created_at == created_at, DesignWork.id < item_id)
+            ))
+        ))
+    
+    items = serializers.design_work_dicts(query.limit(limit + 1), session)
+    next_cursor = _encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+def _page_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+@bp.route('/site-settings', methods=['GET'])
+@cached_response
+def get_site_settings():
+    return jsonify(_site_settings_dict())
+
+@bp.route('/bootstrap', methods=['GET'])
+@cached_response
+def get_bootstrap():
+    """Everything the desktop needs on startup, in one round trip."""
+    return jsonify(_bootstrap_dict())
+
+def _bootstrap_dict(session=None):
+    return {
+        'settings': _site_settings_dict(session),
+        'projects': _active_projects(session),
+        'links': _active_links(session),
+        'folders': _active_folders(session)
+    }
 
 @bp.route('/folders', methods=['GET'])
+@cached_response
 def get_public_folders():
-    folders = Folder.query.filter_by(is_active=True).order_by(Folder.display_order, Folder.created_at.desc()).all()
-    return jsonify([folder.to_dict() for folder in folders])
+    return jsonify(_active_folders())
 
 @bp.route('/folders/<int:folder_id>', methods=['GET'])
+@cached_response
 def get_folder_details(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     if not folder.is_active:
@@ -81,13 +258,39 @@ def get_folder_details(folder_id):
     return jsonify(folder.to_dict())
 
 @bp.route('/folders/<int:folder_id>/work', methods=['GET'])
+@cached_response
 def get_folder_work(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     if not folder.is_active:
         return jsonify({'message': 'Folder not found'}), 404
     
-    items = DesignWork.query.filter_by(folder_id=folder_id, is_active=True).order_by(DesignWork.display_order, DesignWork.created_at.desc()).all()
-    return jsonify([item.to_dict() for item in items])
+    # The unpaginated array is only returned when explicitly asked for.
+    if request.args.get('all') == '1':
+        return jsonify(_active_folder_items(folder_id))
+    
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        cursor = _decode_cursor(cursor)
+        if cursor is None:
+            return jsonify({'message': 'Invalid cursor'}), 400
+    
+    items, next_cursor = _active_folder_items(folder_id, _page_limit(), cursor)
+    return jsonify({'items': items, 'next': next_cursor})
+
+@bp.route('/folders/<int:folder_id>/contents', methods=['GET'])
+@cached_response
+def get_folder_contents(folder_id):
+    """Folder metadata together with the first page of its active items."""
+    folder = Folder.query.get_or_404(folder_id)
+    if not folder.is_active:
+        return jsonify({'message': 'Folder not found'}), 404
+    
+    items, next_cursor = _active_folder_items(folder_id, _page_limit())
+    return jsonify({
+        'folder': folder.to_dict(),
+        'items': items,
+        'next': next_cursor
+    })
 
 # Admin endpoints for folder management
 @bp.route('/folders', methods=['POST'])
@@ -97,11 +300,11 @@ def create_folder():
     folder = Folder(
         name=data.get('name'),
         description=data.get('description'),
-        display_order=Folder.query.count()
+        display_order=next_order(Folder)
     )
     db.session.add(folder)
     db.session.commit()
-    return jsonify(folder.to_dict()), 201
+    return jsonify(folder.to_dict(item_count=0)), 201
 
 @bp.route('/folders/<int:folder_id>', methods=['DELETE'])
 @login_required
@@ -114,15 +317,26 @@ def delete_folder(folder_id):
 @bp.route('/folders/<int:folder_id>/items', methods=['GET'])
 @login_required
 def get_folder_items(folder_id):
-    items = DesignWork.query.filter_by(folder_id=folder_id).order_by(DesignWork.display_order, DesignWork.created_at.desc()).all()
-    return jsonify([item.to_dict() for item in items])
+    return jsonify(serializers.design_work_dicts(
+        serializers.select_design_work().where(DesignWork.folder_id == folder_id)
+        .order_by(DesignWork.display_order, DesignWork.created_at.desc())
+    ))
 
 @bp.route('/folders/<int:folder_id>/upload', methods=['POST'])
 @login_required
 def upload_to_folder(folder_id):
+    """Add a batch of images to a folder in one transaction.
+
+    Files were already streamed to disk while the request was parsed, so
+    this only validates them, takes blob references and bulk-inserts the
+    rows. Responds with the created items and a per-file list of failures.
+    The whole request may be up to UPLOAD_BATCH_MAX_SIZE, each file up to
+    UPLOAD_MAX_FILE_SIZE.
+    """
     from werkzeug.utils import secure_filename
-    import os
-    from PIL import Image
+    
+    # Set before the form is parsed, which is when the limit is enforced.
+    request.max_content_length = current_app.config['UPLOAD_BATCH_MAX_SIZE']
     
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     
@@ -135,57 +349,68 @@ def upload_to_folder(folder_id):
         return jsonify({'message': 'No files provided'}), 400
     
     files = request.files.getlist('files')
-    uploaded_items = []
-    
-    upload_dir = 'backend/app/static/uploads'
-    os.makedirs(upload_dir, exist_ok=True)
+    accepted = []
+    failed = []
     
     for file in files:
-        if file and file.filename:
-            if not allowed_file(file.filename):
-                continue
-            
-            filename = secure_filename(file.filename)
-            timestamp = int(datetime.now().timestamp())
-            unique_filename = f"{timestamp}_{filename}"
-            filepath = os.path.join(upload_dir, unique_filename)
-            
-            file.save(filepath)
-            
-            # Get image dimensions
-            try:
-                with Image.open(filepath) as img:
-                    width, height = img.size
-            except:
-                width, height = None, None
-            
-            # Create database entry
-            design_item = DesignWork(
-                title=filename,
-                file_url=f'/static/uploads/{unique_filename}',
-                thumbnail_url=f'/static/uploads/{unique_filename}',
-                file_type=file.content_type,
-                file_size=os.path.getsize(filepath),
-                width=width,
-                height=height,
-                folder_id=folder_id,
-                display_order=DesignWork.query.filter_by(folder_id=folder_id).count()
-            )
-            db.session.add(design_item)
-            uploaded_items.append(design_item)
+        if not file or not file.filename:
+            continue
+        if not allowed_file(file.filename):
+            failed.append({'filename': file.filename, 'error': 'File type not allowed'})
+            continue
+        image_info = blob_storage.image_info(file)
+        if image_info is None:
+            failed.append({'filename': file.filename, 'error': 'File content is not a supported image'})
+            continue
+        accepted.append((file, image_info))
+    
+    if not accepted:
+        return jsonify({'uploaded': [], 'failed': failed}), 400
     
+    blobs = blob_storage.store_many([(file, file.filename.rsplit('.', 1)[1].lower()) for file, _ in accepted])
+    
+    # New items go after the existing ones, in upload order.
+    start_order = next_order(DesignWork, DesignWork.folder_id == folder_id)
+    rows = []
+    for index, ((file, (width, height)), blob) in enumerate(zip(accepted, blobs)):
+        file_url = blob_storage.url_for(blob)
+        rows.append({
+            'title': secure_filename(file.filename),
+            'file_url': file_url,
+            'thumbnail_url': file_url,
+            'file_type': file.content_type,
+            'file_size': blob.size,
+            'width': width,
+            'height': height,
+            'processing_status': 'pending',
+            'folder_id': folder_id,
+            'display_order': start_order + index * ORDER_GAP
+        })
+    
+    item_ids = db.session.scalars(db.insert(DesignWork).returning(DesignWork.id), rows).all()
     db.session.commit()
-    return jsonify([item.to_dict() for item in uploaded_items]), 201
+    
+    uploaded_items = DesignWork.query.filter(DesignWork.id.in_(item_ids)) \
+        .order_by(DesignWork.display_order).all()
+    
+    # Dimensions and thumbnails are filled in by the image worker.
+    image_worker.submit_many(uploaded_items)
+    
+    return jsonify({
+        'uploaded': [item.to_dict() for item in uploaded_items],
+        'failed': failed
+    }), 201
 
 @bp.route('/design-work/<int:item_id>', methods=['DELETE'])
 @login_required
 def delete_design_item(item_id):
     item = DesignWork.query.get_or_404(item_id)
     
-    # Delete file from disk
+    # Uploads from before content-addressed storage aren't ref-counted;
+    # remove their file directly. Stored blobs are released on delete.
     import os
-    if item.file_url:
-        file_path = item.file_url.replace('/static/uploads/', 'backend/app/static/uploads/')
+    if item.file_url and item.file_url.startswith('/static/uploads/'):
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], item.file_url.rsplit('/', 1)[-1])
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
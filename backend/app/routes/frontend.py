@@ -1,19 +1,29 @@
-from flask import Blueprint, send_from_directory, current_app
-import os
+from flask import Blueprint, abort
+from app import asset_manifest
+from app.assets import IMMUTABLE_PREFIX, IMMUTABLE_CACHE_CONTROL
 
 bp = Blueprint('frontend', __name__)
 
 @bp.route('/')
 def index():
-    out_dir = os.path.join(current_app.root_path, '../../out')
-    if os.path.exists(os.path.join(out_dir, 'index.html')):
-        return send_from_directory(out_dir, 'index.html')
+    entry = asset_manifest.get('index.html')
+    if entry is not None:
+        return asset_manifest.send(entry)
     else:
         return "<h1>Portfolio Site</h1><p>Frontend not built yet. Run 'npm run build' in the Next.js project to build the frontend.</p>"
 
 @bp.route('/<path:path>')
 def serve_static(path):
-    out_dir = os.path.join(current_app.root_path, '../../out')
-    if os.path.exists(os.path.join(out_dir, path)):
-        return send_from_directory(out_dir, path)
-    return send_from_directory(out_dir, 'index.html')
+    entry = asset_manifest.get(path)
+    if entry is not None:
+        cache_control = IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_PREFIX) else None
+        return asset_manifest.send(entry, cache_control)
+    
+    # A missing build asset is a real 404, not a page route.
+    if path.startswith('_next/'):
+        abort(404)
+    
+    entry = asset_manifest.get(f'{path}.html') or asset_manifest.get('index.html')
+    if entry is None:
+        abort(404)
+    return asset_manifest.send(entry)
@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify, current_app, request, abort
+from sqlalchemy import text
+from app import db, metrics
+import hmac
+from app.warmup import readiness, warm_up
+
+bp = Blueprint('health', __name__)
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok'}), 200
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: warm-up has finished and the database answers."""
+    try:
+        db.session.execute(text('SELECT 1'))
+        database = 'ok'
+    except Exception as e:
+        db.session.rollback()
+        database = str(e)
+    
+    # A worker whose warm-up failed (or never ran, outside gunicorn) retries here.
+    if database == 'ok' and not readiness.ready:
+        warm_up(current_app._get_current_object())
+    
+    ready = database == 'ok' and readiness.ready
+    response = jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'database': database,
+        'warmup': readiness.to_dict()
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 200 if ready else 503
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint; needs `Authorization: Bearer <METRICS_TOKEN>`."""
+    if not metrics.enabled or not metrics.token:
+        abort(404)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), metrics.token.encode()):
+        return jsonify({'message': 'Unauthorized'}), 401
+    body, content_type = metrics.generate()
+    response = current_app.response_class(body, content_type=content_type)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,100 @@
+"""Column-level serialization for the listing endpoints.
+
+The functions here produce exactly the dicts the models' to_dict() methods
+do, but from Core selects of the needed columns, so listings skip ORM
+instance hydration and the identity map. Keep the column lists in step
+with to_dict() when a model gains a serialized field.
+
+Every function runs on `db.session` unless given another session; the
+ASGI app passes the sync session of an AsyncSession (via run_sync).
+"""
+from app import db
+from app.models import Project, WebLink, Folder, DesignWork, ImageDerivative
+
+PROJECT_COLUMNS = (
+    Project.id, Project.title, Project.description, Project.technologies, Project.github_url,
+    Project.live_url, Project.image_url, Project.display_order, Project.created_at, Project.is_active,
+)
+WEB_LINK_COLUMNS = (
+    WebLink.id, WebLink.title, WebLink.url, WebLink.icon, WebLink.display_order, WebLink.is_active,
+)
+FOLDER_COLUMNS = (
+    Folder.id, Folder.name, Folder.description, Folder.icon_type, Folder.display_order,
+    Folder.is_active, Folder.created_at, Folder.updated_at,
+)
+DESIGN_WORK_COLUMNS = tuple(DesignWork.__table__.columns)
+
+# Derivatives are fetched for this many items per query.
+SRCSET_BATCH_SIZE = 500
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _dicts(statement, dates=(), session=None):
+    rows = []
+    for row in (session or db.session).execute(statement).mappings():
+        data = dict(row)
+        for key in dates:
+            data[key] = _isoformat(data[key])
+        rows.append(data)
+    return rows
+
+
+def select_projects():
+    return db.select(*PROJECT_COLUMNS)
+
+
+def project_dicts(statement, session=None):
+    return _dicts(statement, ('created_at',), session)
+
+
+def select_web_links():
+    return db.select(*WEB_LINK_COLUMNS)
+
+
+def web_link_dicts(statement, session=None):
+    return _dicts(statement, session=session)
+
+
+def select_folders_with_counts():
+    """Folder columns plus the active item count, as in Folder.query_with_item_counts()."""
+    counts = Folder.item_counts_subquery()
+    return db.select(*FOLDER_COLUMNS, db.func.coalesce(counts.c.item_count, 0).label('item_count')) \
+        .outerjoin(counts, counts.c.folder_id == Folder.id)
+
+
+def folder_dicts(statement, session=None):
+    return _dicts(statement, ('created_at', 'updated_at'), session)
+
+
+def select_design_work():
+    return db.select(*DESIGN_WORK_COLUMNS)
+
+
+def design_work_dicts(statement, session=None):
+    """Rows of `select_design_work()` as DesignWork.to_dict() output.
+
+    The srcsets come from one extra query per SRCSET_BATCH_SIZE items.
+    """
+    items = _dicts(statement, ('project_date', 'created_at', 'updated_at'), session)
+    srcsets = _srcsets([item['id'] for item in items], session)
+    for item in items:
+        item['srcset'] = srcsets.get(item['id'], {})
+    return items
+
+
+def _srcsets(item_ids, session=None):
+    candidates = {}
+    for start in range(0, len(item_ids), SRCSET_BATCH_SIZE):
+        statement = db.select(
+            ImageDerivative.design_work_id, ImageDerivative.format, ImageDerivative.url, ImageDerivative.width
+        ).where(ImageDerivative.design_work_id.in_(item_ids[start:start + SRCSET_BATCH_SIZE])) \
+            .order_by(ImageDerivative.width)
+        for item_id, fmt, url, width in (session or db.session).execute(statement):
+            candidates.setdefault(item_id, {}).setdefault(fmt, []).append(f'{url} {width}w')
+    return {
+        item_id: {fmt: ', '.join(urls) for fmt, urls in formats.items()}
+        for item_id, formats in candidates.items()
+    }
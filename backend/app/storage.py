@@ -0,0 +1,371 @@
+"""Content-addressed storage for uploaded files.
+
+Uploads are hashed while they are written and stored once under their
+SHA-256, so re-uploading the same asset reuses the existing file. Each Blob
+row counts the records pointing at it; the file, and every derivative
+generated from it, is deleted once the count drops to zero and the
+transaction that released it commits. Likewise an upload is only moved
+into the folder once the transaction that took its reference commits, so
+a rollback leaves no file behind.
+
+Multipart uploads are ingested in a single pass: `UploadRequest` has the
+form parser write each file part straight into the upload folder through an
+`UploadStream`, which hashes, measures and sniffs the image header as the
+chunks arrive. Files with a disallowed name or content are discarded as soon
+as that is known, and oversized files abort the request with a 413.
+"""
+import glob
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from flask import Request, current_app
+from PIL import Image
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.exceptions import RequestEntityTooLarge
+
+CHUNK_SIZE = 64 * 1024
+URL_PREFIX = '/admin/uploads/'
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Leading bytes of each accepted image format, and its canonical extension.
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'RIFF', 'webp'),
+)
+SIGNATURE_SIZE = 12
+# How much of the file to keep looking for dimensions in (JPEG EXIF blocks
+# can push the frame header well past the first chunk).
+SNIFF_LIMIT = 256 * 1024
+
+# A stored blob, its thumbnail, or one of its responsive derivatives.
+_CONTENT_ADDRESSED = re.compile(r'^(thumb_)?[0-9a-f]{64}(_w\d+)?\.\w+$')
+
+
+def _sniff_extension(head):
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            if ext == 'webp' and head[8:12] != b'WEBP':
+                return None
+            return ext
+    return None
+
+
+class UploadStream(io.RawIOBase):
+    """Write-through container for one uploaded file part.
+
+    The form parser writes the part into it chunk by chunk; it is then
+    readable like any other upload stream, and `BlobStorage.store` adopts
+    the already written file instead of copying it.
+    """
+
+    def __init__(self, folder, filename, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+        self.extension = None
+        self.width = None
+        self.height = None
+        self.error = None
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._sniffing = True
+        self._path = None
+
+        if not filename or '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ALLOWED_EXTENSIONS:
+            self._reject('File type not allowed')
+            return
+        os.makedirs(folder, exist_ok=True)
+        fd, self._path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def _reject(self, error):
+        # Drop what was written so far and swallow the rest of the part.
+        self.error = error
+        self._sniffing = False
+        self._discard()
+        self._file = io.BytesIO()
+
+    def _discard(self):
+        if self._path is not None:
+            self._file.close()
+            os.remove(self._path)
+            self._path = None
+
+    def _sniff(self, chunk):
+        self._head += chunk
+        if self.extension is None:
+            if len(self._head) < SIGNATURE_SIZE:
+                return
+            self.extension = _sniff_extension(self._head)
+            if self.extension is None:
+                self._reject('File content is not a supported image')
+                return
+        try:
+            with Image.open(io.BytesIO(self._head)) as img:
+                self.width, self.height = img.size
+        except Exception:
+            if len(self._head) < SNIFF_LIMIT:
+                return
+        self._sniffing = False
+        self._head = b''
+
+    def finish(self):
+        """Reject the part if it ended before its header could be checked."""
+        if not self.error and self.extension is None:
+            self._reject('File content is not a supported image')
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, chunk):
+        if self.error:
+            return len(chunk)
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            self._discard()
+            raise RequestEntityTooLarge()
+        if self._sniffing:
+            self._sniff(chunk)
+            if self.error:
+                return len(chunk)
+        self._digest.update(chunk)
+        return self._file.write(chunk)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readinto(self, buffer):
+        return self._file.readinto(buffer)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def move_to(self, path):
+        """Put the written file at `path`, unless identical content is already there."""
+        self._file.close()
+        if os.path.exists(path):
+            os.remove(self._path)
+        else:
+            os.replace(self._path, path)
+        self._path = None
+
+    def close(self):
+        if not self.closed:
+            # Anything not moved into storage by the view is thrown away.
+            self._discard()
+            self._file.close()
+        super().close()
+
+
+class UploadRequest(Request):
+    """Request that streams file uploads into the upload folder as they are parsed."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return UploadStream(config['UPLOAD_FOLDER'], filename, config.get('UPLOAD_MAX_FILE_SIZE'))
+
+
+class BlobStorage:
+
+    def __init__(self):
+        self.app = None
+        self._watched = []
+
+    def init_app(self, app):
+        from app import db
+        from app.models import DesignWork
+
+        self.app = app
+        app.config.setdefault('UPLOAD_MAX_FILE_SIZE', None)
+        app.request_class = UploadRequest
+        if any(watched is db.session for watched in self._watched):
+            return
+        self._watched.append(db.session)
+
+        event.listen(db.session, 'after_commit', self._move_uploads)
+        event.listen(db.session, 'after_commit', self._delete_orphans)
+        event.listen(db.session, 'after_rollback', self._rolled_back)
+        # Catches every way a DesignWork row goes away, including folder cascades.
+        event.listen(DesignWork, 'after_delete', self._release_design_work)
+
+    @property
+    def folder(self):
+        return self.app.config['UPLOAD_FOLDER']
+
+    def url_for(self, blob):
+        return URL_PREFIX + blob.filename
+
+    def is_immutable(self, filename):
+        """True for files whose name is derived from their content hash."""
+        return bool(_CONTENT_ADDRESSED.match(filename))
+
+    def image_info(self, file):
+        """(width, height) sniffed from an upload's header, or None if it was rejected.
+
+        Either dimension is None when the header was too unusual to read
+        while streaming; the image worker measures those later.
+        """
+        stream = self._stream(file)
+        if stream.error:
+            return None
+        return stream.width, stream.height
+
+    def _stream(self, file):
+        """The upload's UploadStream, with the whole part written."""
+        stream = file.stream
+        if not isinstance(stream, UploadStream):
+            stream = self._ingest(file)
+        stream.finish()
+        return stream
+
+    def _ingest(self, file):
+        # Uploads that didn't come through UploadRequest are copied once.
+        stream = UploadStream(self.folder, file.filename, self.app.config['UPLOAD_MAX_FILE_SIZE'])
+        for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+            stream.write(chunk)
+        stream.seek(0)
+        file.stream = stream
+        return stream
+
+    def store(self, file, ext):
+        """Move an uploaded file into storage and take a reference to it.
+
+        Returns the Blob, added to the current session but not committed.
+        """
+        return self.store_many([(file, ext)])[0]
+
+    def store_many(self, uploads):
+        """`store` for a batch of (file, ext) pairs, with one statement for all of them.
+
+        Returns the Blobs in the same order; a file that appears twice in the
+        batch takes two references on one Blob. The files are moved into
+        storage when the session commits.
+        """
+        from app import db
+        from app.models import Blob
+
+        streams = []
+        for file, ext in uploads:
+            stream = self._stream(file)
+            if stream.error:
+                raise ValueError(stream.error)
+            streams.append((stream, ext))
+
+        rows = {}
+        for stream, ext in streams:
+            content_hash = stream.hexdigest()
+            if content_hash in rows:
+                rows[content_hash]['ref_count'] += 1
+            else:
+                ext = stream.extension or ext
+                rows[content_hash] = {'hash': content_hash, 'filename': f'{content_hash}.{ext}',
+                                      'size': stream.size, 'ref_count': 1}
+        stored = {
+            row.hash: Blob(hash=row.hash, filename=row.filename, size=row.size)
+            for row in db.session.execute(self._upsert(db.session, list(rows.values())))
+        }
+
+        blobs = []
+        moves = db.session.info.setdefault('stored_uploads', [])
+        for stream, ext in streams:
+            blob = stored[stream.hexdigest()]
+            moves.append((stream, os.path.join(self.folder, blob.filename)))
+            blobs.append(blob)
+        return blobs
+
+    def _upsert(self, session, rows):
+        """INSERT of Blob rows that adds to ref_count where the hash is already
+        stored, returning each row's hash, filename and size.
+
+        Done in one statement so concurrent uploads of a new file don't
+        collide on the hash, and an upload racing the release of the last
+        reference either bumps the row or recreates it.
+        """
+        from app.models import Blob
+
+        dialect = postgresql if session.get_bind().dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(Blob).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={'ref_count': Blob.ref_count + statement.excluded.ref_count}
+        )
+        return statement.returning(Blob.hash, Blob.filename, Blob.size)
+
+    def release(self, url):
+        """Drop the reference a record held on the file behind `url`."""
+        from app import db
+        self._release(db.session.connection(), db.session, url)
+
+    def _release(self, connection, session, url):
+        from app.models import Blob
+
+        # Uploads from before content addressing have no Blob row and are kept.
+        if not url or not url.startswith(URL_PREFIX):
+            return
+        filename = url[len(URL_PREFIX):]
+        blobs = Blob.__table__
+        connection.execute(
+            blobs.update().where(blobs.c.filename == filename).values(ref_count=blobs.c.ref_count - 1)
+        )
+        ref_count = connection.execute(
+            select(blobs.c.ref_count).where(blobs.c.filename == filename)
+        ).scalar()
+        if ref_count is not None and ref_count <= 0:
+            connection.execute(blobs.delete().where(blobs.c.filename == filename))
+            session.info.setdefault('orphaned_blobs', []).append(filename)
+
+    def _release_design_work(self, mapper, connection, target):
+        from sqlalchemy.orm import object_session
+        self._release(connection, object_session(target), target.file_url)
+
+    def _move_uploads(self, session):
+        for stream, path in session.info.pop('stored_uploads', []):
+            stream.move_to(path)
+
+    def _rolled_back(self, session):
+        session.info.pop('orphaned_blobs', None)
+        for stream, path in session.info.pop('stored_uploads', []):
+            stream.close()
+
+    def _delete_orphans(self, session):
+        from app.models import Blob
+
+        orphaned = session.info.pop('orphaned_blobs', [])
+        if not orphaned:
+            return
+        # An upload that committed since may have stored the same file again.
+        with session.get_bind().connect() as connection:
+            stored = set(connection.scalars(select(Blob.filename).where(Blob.filename.in_(orphaned))))
+        for filename in orphaned:
+            if filename in stored:
+                continue
+            stem = filename.rsplit('.', 1)[0]
+            paths = [filename, f'thumb_{filename}']
+            paths += [os.path.basename(p) for p in glob.glob(os.path.join(self.folder, f'{stem}_w*.*'))]
+            for path in paths:
+                try:
+                    os.remove(os.path.join(self.folder, path))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,97 @@
+"""Worker warm-up before taking traffic.
+
+gunicorn's post_worker_init hook runs `warm_up` in each worker before it
+starts accepting connections. It opens the pool's connections, builds the
+static asset manifest and renders the public API responses into the
+response cache, so the first real visitors don't pay for any of it. The
+readiness state is what /readyz reports.
+"""
+import threading
+import time
+
+from sqlalchemy import text
+
+# Public endpoints every visitor's first page load hits.
+WARMUP_PATHS = (
+    '/api/bootstrap',
+    '/api/site-settings',
+    '/api/projects',
+    '/api/links',
+    '/api/folders',
+    '/api/resume',
+)
+
+
+class Readiness:
+    """Warm-up state of this worker process."""
+
+    def __init__(self):
+        self.state = 'cold'
+        self.error = None
+        self.duration = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def to_dict(self):
+        return {'state': self.state, 'error': self.error, 'duration': self.duration}
+
+
+readiness = Readiness()
+
+
+def _open_connections(app):
+    from app import db
+
+    pool_size = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('pool_size', 1)
+    connections = [db.engine.connect() for _ in range(pool_size)]
+    try:
+        for connection in connections:
+            connection.execute(text('SELECT 1'))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _prime_caches(app):
+    client = app.test_client()
+    paths = list(WARMUP_PATHS)
+    folders = client.get('/api/folders')
+    if folders.status_code == 200:
+        paths += [f"/api/folders/{folder['id']}/contents" for folder in folders.get_json()]
+    for path in paths:
+        # Fill both the plain and the gzip body of each cache entry.
+        client.get(path)
+        client.get(path, headers={'Accept-Encoding': 'gzip'})
+
+
+def warm_up(app):
+    """Warm this worker up and mark it ready. Returns True on success.
+
+    Failures are logged and leave the worker serving but not ready; the
+    next /readyz probe tries again.
+    """
+    from app import asset_manifest
+
+    with readiness._lock:
+        if readiness.ready:
+            return True
+        readiness.state = 'warming'
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                _open_connections(app)
+            asset_manifest.entries()
+            _prime_caches(app)
+        except Exception as e:
+            app.logger.exception('Warm-up failed')
+            readiness.state = 'failed'
+            readiness.error = str(e)
+            return False
+        readiness.duration = round(time.perf_counter() - start, 3)
+        readiness.state = 'ready'
+        readiness.error = None
+        app.logger.info('Worker warmed up in %.3fs', readiness.duration)
+        return True
@@ -0,0 +1,38 @@
+"""Add composite indexes for API listing queries
+
+Revision ID: 5c0e9a7d41b2
+Revises: e172de6e5d19
+Create Date: 2026-10-18 10:12:44.218305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c0e9a7d41b2'
+down_revision = 'e172de6e5d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # On Postgres the is_active indexes are partial, so they only hold the
+    # rows the public endpoints can return.
+    op.create_index('ix_projects_active_order', 'projects', ['is_active', 'display_order'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_web_links_active_order', 'web_links', ['is_active', 'display_order'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_folders_order', 'folders', ['display_order', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_folders_active_order', 'folders', ['is_active', 'display_order', sa.text('created_at DESC')], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_design_work_folder_active_order', 'design_work', ['folder_id', 'is_active', 'display_order', sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_design_work_folder_order', 'design_work', ['folder_id', 'display_order', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_design_work_order', 'design_work', ['display_order', sa.text('created_at DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_design_work_order', table_name='design_work')
+    op.drop_index('ix_design_work_folder_order', table_name='design_work')
+    op.drop_index('ix_design_work_folder_active_order', table_name='design_work')
+    op.drop_index('ix_folders_active_order', table_name='folders')
+    op.drop_index('ix_folders_order', table_name='folders')
+    op.drop_index('ix_web_links_active_order', table_name='web_links')
+    op.drop_index('ix_projects_active_order', table_name='projects')
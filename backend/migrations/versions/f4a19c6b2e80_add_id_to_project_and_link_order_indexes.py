@@ -0,0 +1,31 @@
+"""Add id to the project and link listing indexes
+
+Revision ID: f4a19c6b2e80
+Revises: d52a0b9e7f13
+Create Date: 2026-10-18 22:47:31.604219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a19c6b2e80'
+down_revision = 'd52a0b9e7f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The public listings now break display_order ties by id.
+    op.drop_index('ix_web_links_active_order', table_name='web_links')
+    op.drop_index('ix_projects_active_order', table_name='projects')
+    op.create_index('ix_projects_active_order', 'projects', ['is_active', 'display_order', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_web_links_active_order', 'web_links', ['is_active', 'display_order', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+
+
+def downgrade():
+    op.drop_index('ix_web_links_active_order', table_name='web_links')
+    op.drop_index('ix_projects_active_order', table_name='projects')
+    op.create_index('ix_projects_active_order', 'projects', ['is_active', 'display_order'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_web_links_active_order', 'web_links', ['is_active', 'display_order'], unique=False, postgresql_where=sa.text('is_active'))
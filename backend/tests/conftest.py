@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import auth, create_app, db
+from app.models import User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app on a fresh SQLite database, with images processed inline."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    monkeypatch.setenv('IMAGE_WORKERS', '0')
+    monkeypatch.setenv('FROM_EMAIL', 'site@example.com')
+    monkeypatch.setenv('ADMIN_EMAIL', 'owner@example.com')
+    app = create_app()
+    app.config.update(TESTING=True, UPLOAD_FOLDER=str(tmp_path / 'uploads'))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    """`client`, logged in as an admin."""
+    user = User(username='admin', email='admin@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    assert client.post('/admin/login', json={'username': 'admin', 'password': 'password'}).status_code == 200
+    return client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The clock the throttling buckets read; advance `clock.now` to let them refill."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(auth, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
@@ -0,0 +1,102 @@
+import pytest
+
+from app import db, user_cache
+from app.models import User
+from app.query_profiler import assert_queries
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='admin', email='admin@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def login(client, password='wrong', username='admin', address='10.0.0.1'):
+    return client.post('/admin/login', json={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': address})
+
+
+def test_login_is_throttled_per_address(app, client, user, clock):
+    # Different usernames, so only the per-address bucket runs out.
+    for index in range(app.config['LOGIN_IP_ATTEMPTS']):
+        assert login(client, username=f'user{index}').status_code == 401
+
+    response = login(client, password='password')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= app.config['LOGIN_IP_PERIOD']
+    assert login(client, password='password', address='10.0.0.2').status_code == 200
+
+    clock.now += int(response.headers['Retry-After'])
+    assert login(client, password='password').status_code == 200
+
+
+def test_login_is_throttled_per_username(app, client, user, clock):
+    for index in range(app.config['LOGIN_USERNAME_ATTEMPTS']):
+        assert login(client, address=f'10.0.1.{index}').status_code == 401
+
+    response = login(client, password='password', address='10.0.2.1')
+    assert response.status_code == 429
+    assert login(client, username='other', address='10.0.2.1').status_code == 401
+
+    clock.now += int(response.headers['Retry-After'])
+    assert login(client, password='password', address='10.0.2.1').status_code == 200
+
+
+def test_good_login_forgets_failed_attempts(app, client, user, clock):
+    for index in range(app.config['LOGIN_USERNAME_ATTEMPTS'] - 1):
+        login(client, address=f'10.0.1.{index}')
+    assert login(client, password='password', address='10.0.2.1').status_code == 200
+
+    for index in range(app.config['LOGIN_USERNAME_ATTEMPTS']):
+        assert login(client, address=f'10.0.3.{index}').status_code == 401
+
+
+def cached_user(user_id):
+    # A fresh identity map, so the cache or a query has to supply the user.
+    db.session.expunge_all()
+    return user_cache.load(user_id)
+
+
+def test_cached_user_is_loaded_without_a_query(user):
+    cached_user(user.id)
+
+    with assert_queries(max_count=0):
+        assert cached_user(user.id).username == 'admin'
+
+
+def test_changed_user_is_reloaded(user):
+    cached_user(user.id)
+
+    user = db.session.get(User, user.id)
+    user.email = 'new@example.com'
+    db.session.commit()
+
+    assert cached_user(user.id).email == 'new@example.com'
+
+
+def test_bulk_update_of_users_is_reloaded(user):
+    cached_user(user.id)
+
+    db.session.execute(db.update(User).values(username='renamed'))
+    db.session.commit()
+
+    assert cached_user(user.id).username == 'renamed'
+
+
+def get_folders(app, client):
+    # In an app context of its own, as outside tests: Flask-Login keeps the
+    # request's user in `g`, which would otherwise outlive the request.
+    with app.app_context():
+        return client.get('/admin/folders')
+
+
+def test_deleted_user_is_logged_out(app, admin):
+    assert get_folders(app, admin).status_code == 200
+
+    db.session.execute(db.delete(User))
+    db.session.commit()
+
+    assert get_folders(app, admin).status_code == 302
@@ -0,0 +1,61 @@
+from app import content_version, db
+from app.cache import ContentVersion
+from app.models import Project, User
+
+
+def titles(client):
+    return [project['title'] for project in client.get('/api/projects').json]
+
+
+def test_writes_invalidate_cached_responses(admin):
+    admin.post('/admin/projects', json={'title': 'One'})
+    assert titles(admin) == ['One']
+
+    admin.post('/admin/projects', json={'title': 'Two'})
+    assert titles(admin) == ['One', 'Two']
+
+    admin.put('/admin/projects/1', json={'title': 'First'})
+    assert titles(admin) == ['First', 'Two']
+
+    admin.delete('/admin/projects/2')
+    assert titles(admin) == ['First']
+
+
+def test_bulk_updates_invalidate_cached_responses(admin):
+    for title in ('One', 'Two', 'Three'):
+        admin.post('/admin/projects', json={'title': title})
+    assert titles(admin) == ['One', 'Two', 'Three']
+
+    admin.post('/admin/projects/reorder', json={'move': 3, 'after': None})
+
+    assert titles(admin) == ['Three', 'One', 'Two']
+
+
+def test_other_processes_see_the_bump(admin):
+    # Another worker or host, reading the shared row on every call.
+    other = ContentVersion()
+    other.check_interval = 0
+    before = other.current()
+
+    admin.post('/admin/projects', json={'title': 'One'})
+
+    assert other.current() == content_version.current() > before
+
+
+def test_rolled_back_writes_leave_the_version_alone(app):
+    before = content_version.current()
+
+    db.session.add(Project(title='Never'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert content_version.current() == before
+
+
+def test_user_changes_leave_the_content_version_alone(admin):
+    before = content_version.current()
+
+    db.session.get(User, 1).email = 'new@example.com'
+    db.session.commit()
+
+    assert content_version.current() == before
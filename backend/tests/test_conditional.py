@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from werkzeug.http import http_date
+
+from app import content_version, db
+from app.cache import version_last_modified
+from app.models import Project, VersionStamp
+
+
+@pytest.fixture
+def projects(client):
+    db.session.add_all([Project(title=f'Project {index}', description='x' * 200) for index in range(10)])
+    db.session.commit()
+    return client
+
+
+def changed_at(updated_at):
+    """Pretend the last content change was at `updated_at` (naive UTC)."""
+    content_version.current()
+    db.session.execute(db.update(VersionStamp).values(updated_at=updated_at))
+    db.session.commit()
+    content_version._checked_at = float('-inf')
+
+
+def test_matching_etag_answers_304(projects):
+    etag = projects.get('/api/projects').headers['ETag']
+
+    response = projects.get('/api/projects', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_compressed_variant_etag_answers_304(projects):
+    first = projects.get('/api/projects', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].endswith('-gzip"')
+
+    response = projects.get('/api/projects', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']
+    })
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == first.headers['ETag']
+
+
+def test_etag_changes_after_a_write(admin, projects):
+    etag = projects.get('/api/projects').headers['ETag']
+    assert admin.post('/admin/projects', json={'title': 'New'}).status_code == 201
+
+    response = projects.get('/api/projects', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since_answers_304(projects):
+    changed_at(datetime.utcnow() - timedelta(seconds=5))
+    last_modified = projects.get('/api/projects').headers['Last-Modified']
+
+    response = projects.get('/api/projects', headers={'If-Modified-Since': last_modified})
+
+    assert response.status_code == 304
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(projects):
+    changed_at(datetime.utcnow() - timedelta(seconds=5))
+    last_modified = projects.get('/api/projects').headers['Last-Modified']
+
+    response = projects.get('/api/projects', headers={
+        'If-None-Match': '"v0"', 'If-Modified-Since': last_modified
+    })
+
+    assert response.status_code == 200
+
+
+def test_last_modified_is_withheld_during_the_second_of_a_write(projects):
+    # A change whose second hasn't passed yet: another write could still land in it.
+    changed_at(datetime.utcnow() + timedelta(seconds=0.5))
+
+    response = projects.get('/api/projects', headers={'If-Modified-Since': http_date(datetime.now(timezone.utc))})
+
+    assert response.status_code == 200
+    assert 'Last-Modified' not in response.headers
+
+
+def test_last_modified_rounds_up_to_the_next_second():
+    past = datetime(2026, 1, 1, 12, 0, 0, 300000, tzinfo=timezone.utc)
+    assert version_last_modified(past) == datetime(2026, 1, 1, 12, 0, 1, tzinfo=timezone.utc)
+    assert version_last_modified(past.replace(microsecond=0)) == past.replace(microsecond=0)
+    assert version_last_modified(datetime.now(timezone.utc) + timedelta(seconds=1)) is None
@@ -0,0 +1,162 @@
+import smtplib
+from datetime import datetime
+
+import pytest
+
+from app import db, email_outbox
+from app.mail import MailNotConfigured
+from app.models import OutboxEmail
+
+MESSAGE = {'from': 'visitor@example.com', 'subject': 'Hello', 'message': 'Nice site.'}
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; `failures` are raised by the next sends, in order."""
+
+    connections = 0
+    failures = []
+    sent = []
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, message):
+        if FakeSMTP.failures:
+            raise FakeSMTP.failures.pop(0)
+        FakeSMTP.sent.append(message)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    monkeypatch.setattr(FakeSMTP, 'connections', 0)
+    monkeypatch.setattr(FakeSMTP, 'failures', [])
+    monkeypatch.setattr(FakeSMTP, 'sent', [])
+    return FakeSMTP
+
+
+def make_due(email_id):
+    db.session.execute(
+        db.update(OutboxEmail).where(OutboxEmail.id == email_id).values(next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def test_queued_message_is_delivered(client, smtp):
+    assert client.post('/api/send-email', json=MESSAGE).status_code == 202
+
+    totals = email_outbox.run(once=True)
+
+    assert totals == {'claimed': 1, 'sent': 1, 'retried': 0, 'failed': 0}
+    [message] = smtp.sent
+    assert message['To'] == 'owner@example.com'
+    assert message['From'] == 'site@example.com'
+    assert message['Reply-To'] == 'visitor@example.com'
+    assert db.session.scalars(db.select(OutboxEmail.status)).one() == 'sent'
+
+
+def test_batch_shares_one_connection(client, smtp):
+    for index in range(3):
+        client.post('/api/send-email', json=MESSAGE, environ_base={'REMOTE_ADDR': f'10.0.0.{index}'})
+
+    assert email_outbox.run(once=True)['sent'] == 3
+    assert smtp.connections == 1
+
+
+def test_temporary_failure_is_retried(client, smtp):
+    client.post('/api/send-email', json=MESSAGE)
+    smtp.failures.append(smtplib.SMTPResponseException(451, b'Try again later'))
+
+    assert email_outbox.run(once=True) == {'claimed': 1, 'sent': 0, 'retried': 1, 'failed': 0}
+    email = db.session.scalars(db.select(OutboxEmail)).one()
+    assert (email.status, email.attempts) == ('pending', 1)
+    assert email.next_attempt_at > datetime.utcnow()
+    assert 'Try again later' in email.last_error
+    # Not due yet, so another pass leaves it alone.
+    assert email_outbox.run(once=True)['claimed'] == 0
+
+    make_due(email.id)
+    assert email_outbox.run(once=True)['sent'] == 1
+    db.session.refresh(email)
+    assert (email.status, email.attempts, email.last_error) == ('sent', 2, None)
+
+
+def test_connection_error_is_retried(client, smtp):
+    client.post('/api/send-email', json=MESSAGE)
+    smtp.failures.append(ConnectionRefusedError('refused'))
+
+    assert email_outbox.run(once=True)['retried'] == 1
+    make_due(db.session.scalars(db.select(OutboxEmail.id)).one())
+    assert email_outbox.run(once=True)['sent'] == 1
+    # The broken connection was replaced.
+    assert smtp.connections == 2
+
+
+def test_permanent_failure_is_not_retried(client, smtp):
+    client.post('/api/send-email', json=MESSAGE)
+    smtp.failures.append(smtplib.SMTPResponseException(550, b'Mailbox unavailable'))
+
+    assert email_outbox.run(once=True) == {'claimed': 1, 'sent': 0, 'retried': 0, 'failed': 1}
+    email = db.session.scalars(db.select(OutboxEmail)).one()
+    assert (email.status, email.attempts) == ('failed', 1)
+    assert smtp.sent == []
+
+
+def test_retries_stop_at_max_attempts(client, smtp):
+    client.post('/api/send-email', json=MESSAGE)
+    email_id = db.session.scalars(db.select(OutboxEmail.id)).one()
+    for attempt in range(email_outbox.max_attempts):
+        smtp.failures.append(smtplib.SMTPResponseException(421, b'Busy'))
+        make_due(email_id)
+        email_outbox.run(once=True)
+
+    email = db.session.get(OutboxEmail, email_id)
+    assert (email.status, email.attempts) == ('failed', email_outbox.max_attempts)
+
+
+def test_nothing_is_queued_without_a_recipient(app, client, smtp):
+    app.config['MAIL_RECIPIENT'] = None
+
+    response = client.post('/api/send-email', json=MESSAGE)
+
+    assert response.status_code == 503
+    assert db.session.scalar(db.select(db.func.count()).select_from(OutboxEmail)) == 0
+    with pytest.raises(MailNotConfigured):
+        email_outbox.run(once=True)
+
+
+def test_messages_are_throttled_per_address(app, client):
+    limit = app.config['MAIL_IP_ATTEMPTS']
+    for _ in range(limit):
+        assert client.post('/api/send-email', json=MESSAGE).status_code == 202
+
+    response = client.post('/api/send-email', json=MESSAGE)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    other = client.post('/api/send-email', json=MESSAGE, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert other.status_code == 202
+
+
+def test_throttled_address_recovers(app, client, clock):
+    for _ in range(app.config['MAIL_IP_ATTEMPTS']):
+        client.post('/api/send-email', json=MESSAGE)
+    response = client.post('/api/send-email', json=MESSAGE)
+    assert response.status_code == 429
+    assert db.session.scalar(db.select(db.func.count(OutboxEmail.id))) == app.config['MAIL_IP_ATTEMPTS']
+
+    clock.now += int(response.headers['Retry-After']) - 1
+    assert client.post('/api/send-email', json=MESSAGE).status_code == 429
+    clock.now += 1
+    assert client.post('/api/send-email', json=MESSAGE).status_code == 202
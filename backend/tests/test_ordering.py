@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models import Folder, Project, WebLink
+from app.ordering import ORDER_GAP
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/admin/projects', {'title': 'Project'}),
+    ('/admin/links', {'title': 'Link', 'url': 'https://example.com'}),
+    ('/admin/folders', {'name': 'Folder'}),
+])
+def test_created_items_go_to_the_end(admin, path, body):
+    orders = [admin.post(path, json=body).json['display_order'] for _ in range(3)]
+
+    assert orders == [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP]
+    assert admin.post(path, json={**body, 'display_order': 5}).json['display_order'] == 5
+
+
+def test_created_design_work_goes_to_the_end_of_its_folder(admin):
+    db.session.add_all([Folder(name='One'), Folder(name='Two')])
+    db.session.commit()
+
+    def create(folder_id, **form):
+        return admin.post('/admin/design-work', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(png()), 'work.png'), 'folder_id': str(folder_id), 'title': 'Work', **form
+        }).json['display_order']
+
+    assert [create(1), create(1), create(2)] == [ORDER_GAP, 2 * ORDER_GAP, ORDER_GAP]
+    assert create(1, display_order='7') == 7
+
+
+@pytest.mark.parametrize('model, admin_path, public_path, fields', [
+    (Project, '/admin/projects/reorder', '/api/projects', {'title': 'Project'}),
+    (WebLink, '/admin/links/reorder', '/api/links', {'title': 'Link', 'url': 'https://example.com'}),
+])
+def test_public_listing_breaks_ties_like_reorder(admin, model, admin_path, public_path, fields):
+    # Rows from before sparse ordering, all sharing display_order 0.
+    db.session.add_all([model(display_order=0, **fields) for _ in range(4)])
+    db.session.commit()
+    listed = [item['id'] for item in admin.get(public_path).json]
+    assert listed == [1, 2, 3, 4]
+
+    # Moving the last item to the front renumbers the rest in listing order.
+    response = admin.post(admin_path, json={'move': 4, 'after': None})
+    assert response.status_code == 200
+
+    assert [item['id'] for item in admin.get(public_path).json] == [4, 1, 2, 3]
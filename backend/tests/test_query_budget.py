@@ -0,0 +1,48 @@
+"""Query budgets for the public listing endpoints.
+
+Each endpoint must run a fixed number of statements however many folders
+and items there are, and never the same statement twice (an N+1).
+"""
+import pytest
+
+from app import db
+from app.models import DesignWork, Folder, Project, SiteSettings, WebLink
+from app.query_profiler import assert_queries
+
+
+@pytest.fixture(autouse=True)
+def uncached(monkeypatch):
+    # Every request goes to the database, and the shared version is read
+    # once per test instead of whenever a second has passed.
+    monkeypatch.setenv('API_CACHE_MAX_ENTRIES', '0')
+    monkeypatch.setenv('VERSION_CHECK_INTERVAL', '3600')
+
+
+def seed(size):
+    db.session.add(SiteSettings())
+    for index in range(size):
+        folder = Folder(name=f'Folder {index}', display_order=index)
+        db.session.add(folder)
+        db.session.flush()
+        for position in range(size):
+            db.session.add(DesignWork(title=f'Work {position}', file_url=f'/x/{index}/{position}.png',
+                                      folder_id=folder.id, display_order=position))
+        db.session.add(Project(title=f'Project {index}', display_order=index))
+        db.session.add(WebLink(title=f'Link {index}', url=f'https://example.com/{index}', display_order=index))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('size', [2, 20])
+@pytest.mark.parametrize('path, max_count', [
+    ('/api/bootstrap', 4),
+    ('/api/folders/1/contents', 4),
+    ('/api/folders/1/work', 3),
+])
+def test_listing_query_budget(client, size, path, max_count):
+    seed(size)
+    client.get('/api/site-settings')
+
+    with assert_queries(max_count=max_count, max_repeats=1):
+        response = client.get(path)
+
+    assert response.status_code == 200
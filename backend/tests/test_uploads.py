@@ -0,0 +1,102 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app import blob_storage, db
+from app.models import Blob, Folder
+
+
+def noise_png(size=100):
+    """A PNG that doesn't compress, about 3 * size**2 bytes."""
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), os.urandom(3 * size * size)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def uploader(app, admin):
+    db.session.add(Folder(name='Work'))
+    db.session.commit()
+    # Small limits, so a few 30 KB files make a batch over MAX_CONTENT_LENGTH.
+    app.config.update(MAX_CONTENT_LENGTH=64 * 1024, UPLOAD_MAX_FILE_SIZE=48 * 1024,
+                      UPLOAD_BATCH_MAX_SIZE=256 * 1024)
+    return admin
+
+
+def upload(client, *files):
+    return client.post('/api/folders/1/upload', content_type='multipart/form-data', data={
+        'files': [(io.BytesIO(data), f'{index}.png') for index, data in enumerate(files)]
+    })
+
+
+def test_batch_may_exceed_max_content_length(uploader):
+    files = [noise_png() for _ in range(4)]
+    assert sum(map(len, files)) > 64 * 1024
+
+    response = upload(uploader, *files)
+
+    assert response.status_code == 201
+    assert len(response.json['uploaded']) == 4
+
+
+def test_batch_is_limited_by_upload_batch_max_size(uploader):
+    response = upload(uploader, *[noise_png() for _ in range(10)])
+
+    assert response.status_code == 413
+
+
+def test_batch_files_are_limited_by_upload_max_file_size(uploader):
+    response = upload(uploader, noise_png(), noise_png(140))
+
+    assert response.status_code == 413
+
+
+def test_other_requests_keep_max_content_length(uploader):
+    response = uploader.post('/admin/upload-image', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(b'\x89PNG\r\n\x1a\n' + os.urandom(80 * 1024)), 'big.png')
+    })
+
+    assert response.status_code == 413
+
+
+def stored_files(app):
+    folder = app.config['UPLOAD_FOLDER']
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+def test_rolled_back_upload_leaves_no_file(app):
+    blob_storage.store(FileStorage(io.BytesIO(noise_png()), 'a.png'), 'png')
+    assert stored_files(app) != []
+
+    db.session.rollback()
+
+    assert stored_files(app) == []
+    assert db.session.scalar(db.select(db.func.count()).select_from(Blob)) == 0
+
+
+def test_file_is_moved_into_storage_on_commit(app):
+    blob = blob_storage.store(FileStorage(io.BytesIO(noise_png()), 'a.png'), 'png')
+    assert blob.filename not in stored_files(app)
+
+    db.session.commit()
+
+    assert stored_files(app) == [blob.filename]
+
+
+def test_upload_joins_a_row_committed_meanwhile(app):
+    data = noise_png()
+    content_hash = hashlib.sha256(data).hexdigest()
+    # Another upload of the same file has already committed its row.
+    with db.engine.begin() as connection:
+        connection.execute(db.insert(Blob).values(hash=content_hash, filename=f'{content_hash}.png',
+                                                  size=len(data), ref_count=1))
+
+    blob = blob_storage.store(FileStorage(io.BytesIO(data), 'a.png'), 'png')
+    db.session.commit()
+
+    assert db.session.get(Blob, content_hash).ref_count == 2
+    assert blob.filename in stored_files(app)
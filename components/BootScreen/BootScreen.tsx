@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import styles from './BootScreen.module.css';
+import { getBootstrap } from '@/util/bootstrap';
 
 interface BootScreenProps {
   onBootComplete: () => void;
@@ -20,9 +21,8 @@ const BootScreen: React.FC<BootScreenProps> = ({ onBootComplete }) => {
   });
 
   useEffect(() => {
-    fetch('/api/site-settings')
-      .then(response => response.json())
-      .then(data => {
+    getBootstrap()
+      .then(({ settings: data }) => {
         if (data.boot_screen_line1 || data.boot_screen_line2 || data.boot_screen_copyright) {
           setBootSettings({
             boot_screen_line1: data.boot_screen_line1 || "Sujay's",
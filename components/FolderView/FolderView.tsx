@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useRef } from "react";
 import Image from "next/image";
 import styles from "./FolderView.module.css";
 import folderIcon from "../../assets/folder.png";
@@ -30,6 +30,8 @@ interface Props {
   currentFolderItems?: DesignItem[];
   currentFolderName?: string;
   onBackClick?: () => void;
+  hasMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 const FolderView = ({
@@ -39,8 +41,26 @@ const FolderView = ({
   currentFolderItems,
   currentFolderName,
   onBackClick,
+  hasMore,
+  onLoadMore,
 }: Props) => {
   const isInFolderView = currentFolderItems !== undefined;
+  const sentinelRef = useRef<HTMLDivElement>(null);
+
+  // Ask for the next page once the end of the item grid scrolls into view.
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasMore || !onLoadMore) {
+      return;
+    }
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) {
+        onLoadMore();
+      }
+    });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, onLoadMore, currentFolderItems]);
 
   return (
     <div className={styles.container}>
@@ -115,6 +135,8 @@ const FolderView = ({
         )}
       </div>
 
+      {isInFolderView && hasMore && <div ref={sentinelRef} />}
+
       {!isInFolderView && folders.length === 0 && (
         <div className={styles.emptyState}>
           <p>No folders yet. Use the admin panel to create folders and add your design work.</p>
@@ -14,6 +14,7 @@ interface DesignItem {
   tags?: string;
   width?: number;
   height?: number;
+  srcset?: { [format: string]: string };
 }
 
 interface Props {
@@ -21,6 +22,9 @@ interface Props {
   onClose: () => void;
 }
 
+// The viewer window never shows an image wider than the viewport.
+const IMAGE_SIZES = "100vw";
+
 const ImageViewer = ({ item, onClose }: Props) => {
   useEffect(() => {
     const handleEsc = (e: KeyboardEvent) => {
@@ -54,11 +58,26 @@ const ImageViewer = ({ item, onClose }: Props) => {
 
         <div className={styles.content}>
           <div className={styles.imageContainer}>
-            <img
-              src={item.file_url}
-              alt={item.title}
-              className={styles.image}
-            />
+            <picture>
+              {["avif", "webp"].map(
+                (format) =>
+                  item.srcset?.[format] && (
+                    <source
+                      key={format}
+                      type={`image/${format}`}
+                      srcSet={item.srcset[format]}
+                      sizes={IMAGE_SIZES}
+                    />
+                  )
+              )}
+              <img
+                src={item.file_url}
+                srcSet={item.srcset?.jpeg || item.srcset?.png}
+                sizes={IMAGE_SIZES}
+                alt={item.title}
+                className={styles.image}
+              />
+            </picture>
           </div>
 
           <div className={styles.infoPanel}>
@@ -36,3 +36,41 @@ tmp_upload_dir = None
 
 # Preload app for better memory efficiency
 preload_app = True
+
+
+def on_starting(server):
+    # Metrics files left by a previous run would be added to this one's.
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (pool usage) from /metrics.
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # The app (and its database engine) was created in the master; give
+    # this worker its own connection pool.
+    from wsgi import app
+    from app.pool import dispose_engines
+    dispose_engines(app)
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts connections: open DB connections and
+    # fill the caches so a fresh instance doesn't serve its first
+    # visitors cold.
+    from wsgi import app
+    from app.warmup import warm_up
+    warm_up(app)
@@ -3,6 +3,7 @@ import styles from "./MyWork.module.css";
 import FolderView from "components/FolderView/FolderView";
 import ImageViewer from "components/ImageViewer/ImageViewer";
 import axios from "axios";
+import { getBootstrap } from "@/util/bootstrap";
 
 interface Props {
   id: number;
@@ -28,6 +29,7 @@ interface DesignItem {
   tags?: string;
   width?: number;
   height?: number;
+  srcset?: { [format: string]: string };
 }
 
 const MyWork = ({ id }: Props) => {
@@ -35,6 +37,8 @@ const MyWork = ({ id }: Props) => {
   const [currentFolderId, setCurrentFolderId] = useState<number | null>(null);
   const [currentFolderItems, setCurrentFolderItems] = useState<DesignItem[]>([]);
   const [currentFolderName, setCurrentFolderName] = useState<string>("");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedItem, setSelectedItem] = useState<DesignItem | null>(null);
   const [loading, setLoading] = useState(true);
 
@@ -45,8 +49,8 @@ const MyWork = ({ id }: Props) => {
   const fetchFolders = async () => {
     try {
       setLoading(true);
-      const response = await axios.get("/api/folders");
-      setFolders(response.data);
+      const { folders } = await getBootstrap();
+      setFolders(folders);
     } catch (error) {
       console.error("Error fetching folders:", error);
     } finally {
@@ -57,12 +61,12 @@ const MyWork = ({ id }: Props) => {
   const handleFolderClick = async (folderId: number) => {
     try {
       setLoading(true);
-      const folderResponse = await axios.get(`/api/folders/${folderId}`);
-      const itemsResponse = await axios.get(`/api/folders/${folderId}/work`);
+      const response = await axios.get(`/api/folders/${folderId}/contents`);
       
       setCurrentFolderId(folderId);
-      setCurrentFolderName(folderResponse.data.name);
-      setCurrentFolderItems(itemsResponse.data);
+      setCurrentFolderName(response.data.folder.name);
+      setCurrentFolderItems(response.data.items);
+      setNextCursor(response.data.next);
     } catch (error) {
       console.error("Error fetching folder items:", error);
     } finally {
@@ -70,10 +74,29 @@ const MyWork = ({ id }: Props) => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!currentFolderId || !nextCursor || loadingMore) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const response = await axios.get(`/api/folders/${currentFolderId}/work`, {
+        params: { cursor: nextCursor },
+      });
+      setCurrentFolderItems((items) => [...items, ...response.data.items]);
+      setNextCursor(response.data.next);
+    } catch (error) {
+      console.error("Error fetching more folder items:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleBackClick = () => {
     setCurrentFolderId(null);
     setCurrentFolderItems([]);
     setCurrentFolderName("");
+    setNextCursor(null);
   };
 
   const handleItemClick = (item: DesignItem) => {
@@ -134,6 +157,8 @@ const MyWork = ({ id }: Props) => {
             currentFolderName={currentFolderName}
             onBackClick={handleBackClick}
             onItemClick={handleItemClick}
+            hasMore={nextCursor !== null}
+            onLoadMore={handleLoadMore}
           />
         )}
       </div>
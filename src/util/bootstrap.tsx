@@ -0,0 +1,27 @@
+export interface BootstrapData {
+  settings: { [key: string]: any };
+  projects: any[];
+  links: any[];
+  folders: any[];
+}
+
+let bootstrapRequest: Promise<BootstrapData> | null = null;
+
+// All desktop-startup data comes from a single /api/bootstrap request that
+// is shared by every component asking for it during this page load.
+export const getBootstrap = (): Promise<BootstrapData> => {
+  if (!bootstrapRequest) {
+    bootstrapRequest = fetch("/api/bootstrap")
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Bootstrap request failed: ${response.status}`);
+        }
+        return response.json();
+      })
+      .catch((error) => {
+        bootstrapRequest = null;
+        throw error;
+      });
+  }
+  return bootstrapRequest;
+};